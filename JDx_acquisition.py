@@ -0,0 +1,493 @@
+import collections
+import queue
+import threading
+import time
+
+import serial
+
+from JDx_lut import is_end_of_lut
+from JDx_statistics import Stream_Statistics
+from JDx_transport import JDx_Transport, command_key
+
+
+POLL_COMMAND = ";000,v,v\r\n"
+POLL_INTERVAL = 0.1
+STREAM_ON_COMMAND = ";000,s,1\r\n"
+STREAM_OFF_COMMAND = ";000,s,0\r\n"
+LUT_COMMAND = ";000,?\r\n"
+# how long the port has to stay quiet after ;000,s,0 before the stream counts as stopped.
+STREAM_SETTLE_TIME = 0.2
+# longest a cancelled LUT download or a stopped stream drains what the sensor still sends before handing the port
+# back. if the sensor keeps sending, the port needs a resync (see discard_input) before the next command.
+CANCEL_DRAIN_TIME = 0.5
+# times ;000,s,0 is sent before a stream that keeps coming is given up on.
+STREAM_OFF_ATTEMPTS = 2
+# host backlog, in bytes, that counts as an overrun. usb-serial drivers typically buffer 4 KiB before dropping data.
+OVERRUN_BYTES = 3072
+
+# baud change request with a {baud} field, such as ";000,w,<command>,{baud}\r\n". No verified command is known for
+# the JDx, so fast LUT dumps stay off until it is set from the sensor's protocol document.
+BAUD_COMMAND = None
+# rates tried for a fast LUT dump, fastest first.
+FAST_BAUD_RATES = (921600, 460800, 230400, 115200)
+# time the sensor gets to switch rates, and to answer the link check at the new one.
+BAUD_SETTLE_TIME = 0.1
+LINK_CHECK_COMMAND = ";000,q,q\r\n"
+LINK_CHECK_TIMEOUT = 0.5
+
+
+POLL_MODE = "poll"
+STREAM_MODE = "stream"
+
+# one parsed output frame from the sensor. frame keeps the raw text for logging, time is the time.monotonic()
+# reading taken when the frame was received.
+Sample = collections.namedtuple(
+    "Sample", ["address", "x", "y", "temperature", "frame", "time"]
+)
+
+
+def parse_sample(frame: str, received: float = 0.0) -> Sample:
+    """parse a JDx output frame (";addr,v,v,x,y,t") into a sample.
+
+    Args:
+        frame (str): frame read from the sensor, with or without its terminator.
+        received (float, optional): time.monotonic() when the frame arrived. Defaults to 0.0.
+
+    Raises:
+        ValueError: the frame does not hold x, y and temperature readings.
+
+    Returns:
+        Sample: parsed sample.
+    """
+    frame = frame.rstrip().replace("+", "")
+    data = frame.split(",")
+    try:
+        return Sample(
+            data[0], float(data[3]), float(data[4]), float(data[5]), frame, received
+        )
+    except (IndexError, ValueError):
+        raise ValueError(f"Could not parse sample from {frame!r}")
+
+
+def drain(samples: queue.SimpleQueue) -> list:
+    """take everything currently in a queue without blocking.
+
+    Args:
+        samples (queue.SimpleQueue): queue filled by a worker.
+
+    Returns:
+        list: items in the order they were queued.
+    """
+    items = []
+    while True:
+        try:
+            items.append(samples.get_nowait())
+        except queue.Empty:
+            return items
+
+
+def discard_input(
+    connection: JDx_Transport, settle_time: float = STREAM_SETTLE_TIME, max_time: float = None
+) -> bool:
+    """read and drop everything the sensor sends until the port has been quiet for settle_time.
+
+    Args:
+        connection (JDx_Transport): open transport to the sensor.
+        settle_time (float, optional): seconds of silence to wait for. Defaults to STREAM_SETTLE_TIME.
+        max_time (float, optional): seconds after which to give up on the port going quiet. Defaults to None, wait
+            as long as the sensor keeps sending.
+
+    Returns:
+        bool: True when the port went quiet, False when max_time ran out first.
+    """
+    started = quiet_since = time.monotonic()
+    quiet = True
+    while time.monotonic() - quiet_since < settle_time:
+        if max_time is not None and time.monotonic() - started >= max_time:
+            quiet = False
+            break
+        connection.read_frames(block=False)
+        # any byte counts, a frame can arrive slower than settle_time.
+        if connection.backlog:
+            quiet_since = time.monotonic()
+        else:
+            time.sleep(0.01)
+    connection.reset()
+    return quiet
+
+
+def read_lut_batches(connection: JDx_Transport):
+    """yield the lines of a ;000,? LUT dump in the batches they arrive in, up to and including the end of LUT line.
+    The dump must already have been requested.
+
+    Args:
+        connection (JDx_Transport): open transport to the sensor.
+
+    Raises:
+        TimeoutError: the sensor stopped sending before the end of the LUT.
+
+    Yields:
+        list: lines of the LUT output stream, without terminators.
+    """
+    while True:
+        frames = connection.read_frames()
+        if not frames:
+            raise TimeoutError("Timed out waiting for the LUT.")
+        batch = []
+        for data in frames:
+            batch.append(data.replace("+", ""))
+            if is_end_of_lut(data):
+                yield batch
+                return
+        yield batch
+
+
+def check_link(connection: JDx_Transport) -> bool:
+    """check that the sensor answers ;000,q,q at the current baud.
+
+    Args:
+        connection (JDx_Transport): open transport to the sensor.
+
+    Returns:
+        bool: True when a readable reply came back.
+    """
+    timeout = connection.timeout
+    connection.timeout = LINK_CHECK_TIMEOUT
+    try:
+        connection.reset()
+        connection.write(LINK_CHECK_COMMAND)
+        return any(
+            command_key(frame.replace("+", "")) == ("q", "q")
+            for frame in connection.read_frames()
+        )
+    finally:
+        connection.timeout = timeout
+
+
+def change_baud(connection: JDx_Transport, baud: int, command: str = BAUD_COMMAND) -> bool:
+    """switch the sensor, then the host, to another baud and check the link.
+
+    Args:
+        connection (JDx_Transport): open transport to the sensor.
+        baud (int): new baud rate.
+        command (str, optional): baud change request, with a {baud} field. Defaults to BAUD_COMMAND.
+
+    Returns:
+        bool: True when the sensor answers at the new baud.
+    """
+    if baud != connection.baud:
+        connection.write(command.format(baud=baud))
+        time.sleep(BAUD_SETTLE_TIME)
+        connection.baud = baud
+    return check_link(connection)
+
+
+def restore_baud(connection: JDx_Transport, baud: int, command: str = BAUD_COMMAND) -> bool:
+    """ask the sensor to return to a baud, whatever rate it is at now, then switch the host and check the link.
+
+    Args:
+        connection (JDx_Transport): open transport to the sensor.
+        baud (int): baud rate to return to.
+        command (str, optional): baud change request, with a {baud} field. Defaults to BAUD_COMMAND.
+
+    Returns:
+        bool: True when the sensor answers at the baud.
+    """
+    connection.write(command.format(baud=baud))
+    time.sleep(BAUD_SETTLE_TIME)
+    connection.baud = baud
+    return check_link(connection)
+
+
+def negotiate_fast_baud(
+    connection: JDx_Transport, rates=FAST_BAUD_RATES, command: str = BAUD_COMMAND
+) -> int:
+    """move the link to the fastest of the rates the sensor and host both accept.
+
+    A rate that fails the link check is backed out of (the sensor is asked to return to the original baud) before
+    the next one is tried.
+
+    Args:
+        connection (JDx_Transport): open transport to the sensor.
+        rates (iterable, optional): rates to try. Defaults to FAST_BAUD_RATES.
+        command (str, optional): baud change request, with a {baud} field. Defaults to BAUD_COMMAND.
+
+    Raises:
+        ValueError: no baud change command is configured.
+        ConnectionError: a failed attempt could not be backed out of.
+
+    Returns:
+        int: the baud in use afterwards, the original one when no faster rate worked.
+    """
+    if command is None:
+        raise ValueError("No baud change command is configured, set BAUD_COMMAND in JDx_acquisition.py")
+    original = connection.baud
+    for baud in sorted(rates, reverse=True):
+        if baud <= original:
+            break
+        # try the rate on the host first, the sensor must not be moved to a rate the host cannot follow.
+        try:
+            connection.baud = baud
+        except (ValueError, serial.SerialException):
+            continue
+        finally:
+            connection.baud = original
+        if change_baud(connection, baud, command):
+            return baud
+        if not restore_baud(connection, original, command):
+            raise ConnectionError(f"Lost the sensor while trying {baud} baud.")
+    return original
+
+
+class JDx_Acquisition_Worker(threading.Thread):
+    """read samples from a JDx on a background thread.
+
+    In poll mode the worker asks for one sample per interval with ;000,v,v. In stream mode it turns the sensor's
+    own output on with ;000,s,1 and consumes every frame at the sensor's ODR.
+
+    The worker owns the connection while it runs. Batches of parsed samples go to the samples queue and problems to
+    the errors queue, so the GUI thread never waits on the serial port.
+    """
+
+    def __init__(
+        self,
+        connection: JDx_Transport,
+        mode: str = POLL_MODE,
+        interval: float = POLL_INTERVAL,
+    ):
+        """set up the worker, call start() to begin acquisition.
+
+        Args:
+            connection (JDx_Transport): open transport to the sensor.
+            mode (str, optional): POLL_MODE or STREAM_MODE. Defaults to POLL_MODE.
+            interval (float, optional): seconds between polls in poll mode. Defaults to POLL_INTERVAL.
+        """
+        super(JDx_Acquisition_Worker, self).__init__(daemon=True)
+        if mode not in (POLL_MODE, STREAM_MODE):
+            raise ValueError(f"Unknown acquisition mode {mode!r}")
+        self.connection = connection
+        self.mode = mode
+        self.interval = interval
+        self.samples = queue.SimpleQueue()
+        self.errors = queue.SimpleQueue()
+        self.stats = Stream_Statistics()
+        # wall-clock and monotonic readings taken together, to turn sample times into unix time.
+        self.clock_anchor = (time.time(), time.monotonic())
+        # monotonic time the latest read returned. every sample stamped up to it is already in the samples queue, so
+        # samples of several workers can be merged in order up to the lowest last_read.
+        self.last_read = time.monotonic()
+        # the port was handed back while the sensor was still streaming, drain it with discard_input before using it.
+        self.resync_needed = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        if self.mode == STREAM_MODE:
+            self._run_stream()
+        else:
+            self._run_poll()
+
+    def _run_poll(self):
+        next_poll = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                frame = self.connection.query(POLL_COMMAND)
+                if frame:
+                    try:
+                        sample = parse_sample(frame, time.monotonic())
+                    except ValueError:
+                        self.stats.add(1, 1)
+                        raise
+                    self.stats.add(1)
+                    self.samples.put([sample])
+                else:
+                    self.errors.put("Timed out waiting for the sensor.")
+            except Exception as e:
+                self.errors.put(str(e))
+            self.last_read = time.monotonic()
+
+            next_poll += self.interval
+            delay = next_poll - time.monotonic()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                next_poll = time.monotonic()
+
+    def _run_stream(self):
+        try:
+            self.connection.write(STREAM_ON_COMMAND)
+            while not self._stop_event.is_set():
+                frames = self.connection.read_frames()
+                if not frames:
+                    self.last_read = time.monotonic()
+                    self.errors.put("Timed out waiting for the sensor stream.")
+                    continue
+                # frames read together share the time of the read, the port does not tell when each one arrived.
+                received = time.monotonic()
+                batch = []
+                for frame in frames:
+                    try:
+                        batch.append(parse_sample(frame, received))
+                    except ValueError:
+                        # command echoes and corrupted frames.
+                        pass
+                self.stats.add(len(frames), len(frames) - len(batch))
+                # the backlog is measured before the read, the port is drained by now.
+                if self.connection.backlog > OVERRUN_BYTES:
+                    self.stats.overruns += 1
+                if batch:
+                    self.samples.put(batch)
+                self.last_read = received
+        except Exception as e:
+            self.errors.put(str(e))
+        finally:
+            self._stop_stream()
+
+    def _stop_stream(self) -> None:
+        """turn the sensor stream off and discard whatever it sent after the request.
+
+        Each request gets CANCEL_DRAIN_TIME to quiet the port, and it is sent up to STREAM_OFF_ATTEMPTS times. If the
+        sensor still streams after that, the port is handed back with resync_needed set.
+        """
+        try:
+            for _ in range(STREAM_OFF_ATTEMPTS):
+                self.connection.write(STREAM_OFF_COMMAND)
+                if discard_input(self.connection, max_time=CANCEL_DRAIN_TIME):
+                    return
+            self.resync_needed = True
+            self.errors.put("The sensor did not stop streaming, it is discarded before the next command.")
+        except Exception as e:
+            self.errors.put(str(e))
+
+    def take_samples(self) -> list:
+        """take every sample acquired since the last call.
+
+        Returns:
+            list: samples, oldest first.
+        """
+        return [sample for batch in drain(self.samples) for sample in batch]
+
+    def wall_time(self, received: float) -> float:
+        """convert a sample's monotonic receipt time to unix time.
+
+        Args:
+            received (float): Sample.time.
+
+        Returns:
+            float: seconds since the epoch.
+        """
+        wall, monotonic = self.clock_anchor
+        return wall + (received - monotonic)
+
+    def take_errors(self) -> list:
+        """take every error reported since the last call.
+
+        Returns:
+            list: error messages, oldest first.
+        """
+        return drain(self.errors)
+
+    def stop(self, timeout: float = None) -> None:
+        """ask the worker to finish and wait for it to release the connection.
+
+        Args:
+            timeout (float, optional): seconds to wait for the thread. Defaults to waiting until it exits. The
+                connection is still the worker's if it is alive after the timeout.
+        """
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+class LUT_Download_Worker(threading.Thread):
+    """download the LUT from a JDx on a background thread.
+
+    Lines are handed over in batches through the lines queue as they arrive, so the caller can show the dump
+    progressively. cancel() stops the download within CANCEL_DRAIN_TIME. The sensor may still be sending the rest of
+    the dump then, which resync_needed tells.
+    """
+
+    def __init__(
+        self,
+        connection: JDx_Transport,
+        fast_baud_rates=None,
+        baud_command: str = BAUD_COMMAND,
+    ):
+        """set up the worker, call start() to request the dump.
+
+        Args:
+            connection (JDx_Transport): open transport to the sensor.
+            fast_baud_rates (iterable, optional): rates to try for the dump, see negotiate_fast_baud. The original
+                baud is restored afterwards, also on error or cancel. Defaults to None, dump at the current baud.
+            baud_command (str, optional): baud change request, with a {baud} field. Defaults to BAUD_COMMAND. Without
+                one, fast_baud_rates is ignored and an error is reported.
+        """
+        super(LUT_Download_Worker, self).__init__(daemon=True)
+        self.connection = connection
+        self.fast_baud_rates = fast_baud_rates
+        self.baud_command = baud_command
+        self.lines = queue.SimpleQueue()
+        self.errors = queue.SimpleQueue()
+        self.completed = False  # the end of LUT line was received
+        self.cancelled = False
+        # the port was handed back while the sensor was still sending, drain it with discard_input before using it.
+        self.resync_needed = False
+        self.started_at = None
+        self.original_baud = connection.baud
+        self.baud = self.original_baud  # baud the dump ran at
+        self._cancel_event = threading.Event()
+
+    def run(self):
+        self.started_at = time.monotonic()
+        try:
+            if self.fast_baud_rates and self.baud_command is None:
+                self.errors.put(f"No baud change command is configured, dumping at {self.original_baud} baud.")
+            elif self.fast_baud_rates:
+                self.baud = negotiate_fast_baud(
+                    self.connection, self.fast_baud_rates, self.baud_command
+                )
+            self.connection.write(LUT_COMMAND)
+            for batch in read_lut_batches(self.connection):
+                self.lines.put(batch)
+                if self._cancel_event.is_set():
+                    self.cancelled = True
+                    self.resync_needed = not discard_input(self.connection, max_time=CANCEL_DRAIN_TIME)
+                    return
+            self.completed = True
+        except Exception as e:
+            self.errors.put(str(e))
+        finally:
+            if self.connection.baud != self.original_baud:
+                self._restore()
+
+    def _restore(self) -> None:
+        """put the sensor and host back on the original baud."""
+        try:
+            discard_input(self.connection, max_time=CANCEL_DRAIN_TIME)
+            if restore_baud(self.connection, self.original_baud, self.baud_command):
+                return
+        except Exception:
+            pass
+        self.connection.baud = self.original_baud
+        self.errors.put(
+            f"Could not confirm the sensor is back at {self.original_baud} baud, power cycle it if it stops answering."
+        )
+
+    def cancel(self) -> None:
+        """stop the download at the next batch."""
+        self._cancel_event.set()
+
+    def take_lines(self) -> list:
+        """take every line received since the last call.
+
+        Returns:
+            list: lines of the LUT output stream, oldest first.
+        """
+        return [line for batch in drain(self.lines) for line in batch]
+
+    def take_errors(self) -> list:
+        """take every error reported since the last call.
+
+        Returns:
+            list: error messages, oldest first.
+        """
+        return drain(self.errors)
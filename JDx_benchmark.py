@@ -0,0 +1,407 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy
+
+from JDx_acquisition import STREAM_MODE, JDx_Acquisition_Worker, parse_sample
+from JDx_emulator import JDx_Emulator, open_socket
+from JDx_log import JDx_Log_Writer
+from JDx_lut import compute_deviations, number_points, parse_lut
+from JDx_statistics import Stream_Statistics
+from JDx_transport import JDx_Transport, open_serial_connection
+
+
+BENCHMARK_ODR = 1000.0  # frames/s of the canned stream, sets the batch size of the plot benchmark
+PLOT_INTERVAL = 0.033  # seconds between JDx_display redraws
+LONG_HISTORY_SECONDS = 600.0  # plot history of the plot_long benchmark, redraws should cost the same as plot's
+FRAME_BATCH = 64  # frames per read in the decode benchmark
+LUT_BATCH = 200  # lines per batch in the incremental LUT benchmark
+LUT_POINTS = 512  # points per table of the canned LUT
+REGRESSION_THRESHOLD = 0.2  # throughput drop that fails a comparison
+
+
+def canned_frames(count: int, capture: str = None) -> list:
+    """output frames to run the benchmarks on.
+
+    Args:
+        count (int): number of frames.
+        capture (str, optional): text log written by JDx_display, its sample frames are used (repeated as needed).
+            Defaults to None, frames from a seeded emulator.
+
+    Returns:
+        list: frames without terminators.
+    """
+    if capture:
+        with open(capture) as file:
+            frames = [line.rstrip("\n").partition(" - ")[2] for line in file]
+        frames = [frame for frame in frames if frame.startswith(";")]
+        if not frames:
+            raise ValueError(f"No frames in {capture}")
+        return (frames * (count // len(frames) + 1))[:count]
+
+    emulator = JDx_Emulator(noise=0.001, seed=0)
+    return [emulator.sample_frame(i / BENCHMARK_ODR) for i in range(count)]
+
+
+def canned_lut(capture: str = None) -> list:
+    """LUT dump to run the LUT benchmarks on.
+
+    Args:
+        capture (str, optional): file holding a raw ;000,? dump, such as a JDx_fleet lut.txt. Defaults to None, the
+            dump of a seeded emulator with LUT_POINTS points per table.
+
+    Returns:
+        list: lines of the dump.
+    """
+    if capture:
+        with open(capture) as file:
+            return [line.rstrip("\n") for line in file]
+    return JDx_Emulator(lut_points=LUT_POINTS).lut_lines()
+
+
+def summarize(latencies: list, items: int, elapsed: float) -> dict:
+    """throughput and latency percentiles of a benchmark.
+
+    Args:
+        latencies (list): seconds taken by each operation.
+        items (int): samples, lines or points processed in all.
+        elapsed (float): seconds for the whole run.
+
+    Returns:
+        dict: ops, items, seconds, items_per_s and p50/p95/p99/max operation latency in microseconds.
+    """
+    latencies = numpy.asarray(latencies) * 1e6
+    p50, p95, p99 = numpy.percentile(latencies, (50, 95, 99))
+    return {
+        "ops": len(latencies),
+        "items": items,
+        "seconds": elapsed,
+        "items_per_s": items / elapsed if elapsed > 0 else 0.0,
+        "latency_us": {"p50": p50, "p95": p95, "p99": p99, "max": float(latencies.max())},
+    }
+
+
+def run_ops(op, batches) -> dict:
+    """time an operation over each batch.
+
+    Args:
+        op (callable): op(batch) -> number of items processed.
+        batches (iterable): arguments of the operation.
+
+    Returns:
+        dict: see summarize.
+    """
+    latencies = []
+    items = 0
+    started = time.perf_counter()
+    for batch in batches:
+        start = time.perf_counter()
+        items += op(batch)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, items, time.perf_counter() - started)
+
+
+class Capture_Port:
+    """in-memory serial port that replays captured bytes, so the decode benchmark measures only host side work."""
+
+    timeout = 0
+
+    def __init__(self):
+        self._data = bytearray()
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._data)
+
+    def feed(self, data: bytes) -> None:
+        self._data += data
+
+    def read(self, size: int) -> bytes:
+        data = bytes(self._data[:size])
+        del self._data[:size]
+        return data
+
+    def reset_input_buffer(self) -> None:
+        self._data.clear()
+
+
+def bench_decode(frames: list) -> dict:
+    """transport framing and sample parsing, as the acquisition worker does for update_plot."""
+    port = Capture_Port()
+    connection = JDx_Transport(port)
+    chunks = [
+        "".join(f"{frame}\r\n" for frame in frames[i : i + FRAME_BATCH]).encode()
+        for i in range(0, len(frames), FRAME_BATCH)
+    ]
+    latencies = []
+    samples = 0
+    started = time.perf_counter()
+    for chunk in chunks:
+        port.feed(chunk)
+        start = time.perf_counter()
+        received = time.monotonic()
+        for frame in connection.read_frames(block=False):
+            try:
+                parse_sample(frame, received)
+                samples += 1
+            except ValueError:
+                pass
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, samples, time.perf_counter() - started)
+
+
+def bench_log(frames: list, directory: str) -> dict:
+    """one log write per response, as query_and_log_response does."""
+    writer = JDx_Log_Writer(os.path.join(directory, "benchmark_log.txt"))
+
+    def op(frame):
+        writer.write(frame)
+        return 1
+
+    result = run_ops(op, frames)
+    writer.close()
+    return result
+
+
+class Canned_Worker:
+    """stands in for JDx_Acquisition_Worker in the plot benchmark, handing out canned batches of samples."""
+
+    # not STREAM_MODE, so the display keeps the history size set for BENCHMARK_ODR instead of fitting it to the
+    # rate the canned samples are replayed at.
+    mode = "canned"
+
+    def __init__(self):
+        self.batch = []
+        self.stats = Stream_Statistics()
+        self.started = time.time()
+
+    def take_errors(self) -> list:
+        return []
+
+    def take_samples(self) -> list:
+        batch, self.batch = self.batch, []
+        return batch
+
+    def wall_time(self, received: float) -> float:
+        return self.started + received
+
+
+def bench_plot(frames: list, directory: str, history_seconds: float = None) -> dict:
+    """JDx_Display_Window.update_plot on the offscreen Qt platform, one redraw per display timer tick, with the plot
+    history full.
+
+    Args:
+        frames (list): frames to replay.
+        directory (str): directory for the display's log.
+        history_seconds (float, optional): length of the plot history. Defaults to the display's default.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5 import QtWidgets
+
+    import JDx_display
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = JDx_display.JDx_Display_Window()
+    window.log_writer.set_path(os.path.join(directory, "benchmark_display_log.txt"))
+    window.worker = Canned_Worker()
+    window.acquisition_started = 0.0
+    window.sample_rate = BENCHMARK_ODR
+    if history_seconds:
+        window.history_seconds = history_seconds
+    window.history.resize(window.history_capacity())
+
+    # canned samples are stamped as if they arrived at BENCHMARK_ODR from the start of the acquisition.
+    samples = [parse_sample(frame, i / BENCHMARK_ODR) for i, frame in enumerate(frames)]
+    size = max(1, int(BENCHMARK_ODR * PLOT_INTERVAL))
+    batches = [samples[i : i + size] for i in range(0, len(samples), size)]
+    # fill the history with the samples that came before, a full plot is the steady state.
+    capacity = window.history.capacity
+    window.history.extend(
+        (
+            (numpy.arange(capacity) - capacity) / BENCHMARK_ODR,
+            numpy.resize([sample.x for sample in samples], capacity),
+            numpy.resize([sample.y for sample in samples], capacity),
+        )
+    )
+    window.sample_count = capacity
+
+    def op(batch):
+        window.worker.batch = batch
+        window.update_plot()
+        app.processEvents()
+        return len(batch)
+
+    # the first redraw decimates the whole history, the ones after only the new samples.
+    op(batches[0])
+    result = run_ops(op, batches[1:])
+    window.worker = None
+    window.close()
+    return result
+
+
+def bench_lut_parse(lines: list) -> dict:
+    """parse of a whole dump, as finish_lut_download does."""
+    return run_ops(lambda dump: len(parse_lut(dump)[0]), [lines] * 20)
+
+
+def bench_lut_incremental(lines: list) -> dict:
+    """batch by batch parsing while the dump arrives, as poll_lut_download does."""
+    batches = [lines[i : i + LUT_BATCH] for i in range(0, len(lines), LUT_BATCH)]
+    lut = parse_lut([])[0]
+
+    def op(batch):
+        nonlocal lut
+        chunk, _ = parse_lut(batch)
+        lut = number_points(numpy.concatenate((lut, chunk)))
+        return len(chunk)
+
+    return run_ops(op, batches)
+
+
+def bench_deviations(lines: list) -> dict:
+    """compute_deviations over the whole LUT, as get_deviations does on every redraw."""
+    lut, _ = parse_lut(lines)
+    return run_ops(lambda table: len(compute_deviations(table)), [lut] * 50)
+
+
+def bench_stream(duration: float, odr: float, device: str = None) -> dict:
+    """end to end stream through JDx_Acquisition_Worker from an emulator on a local socket, or a real device.
+    Latency is the age of each sample when the consumer takes it."""
+    stop = None
+    if device is None:
+        device, stop = open_socket(JDx_Emulator(odr=odr, seed=0))
+    connection = open_serial_connection(device, 19200, "E", timeout=1)
+    worker = JDx_Acquisition_Worker(connection, mode=STREAM_MODE)
+    worker.start()
+    ages = []
+    end = time.monotonic() + duration
+    started = time.monotonic()
+    while time.monotonic() < end:
+        time.sleep(PLOT_INTERVAL)
+        now = time.monotonic()
+        ages.extend(now - sample.time for sample in worker.take_samples())
+    elapsed = time.monotonic() - started
+    worker.stop()
+    connection.close()
+    if stop is not None:
+        stop.set()
+    if not ages:
+        raise RuntimeError(f"No samples from {device}")
+    return summarize(ages, len(ages), elapsed)
+
+
+def environment() -> dict:
+    """what the results were measured on."""
+    try:
+        revision = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        revision = ""
+    return {
+        "created": datetime.datetime.now().isoformat(),
+        "revision": revision,
+        "python": sys.version.split()[0],
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """compare results to a baseline run.
+
+    Args:
+        results (dict): benchmark name to summary.
+        baseline (dict): benchmark name to summary, from an earlier run.
+        threshold (float, optional): throughput drop counted as a regression. Defaults to REGRESSION_THRESHOLD.
+
+    Returns:
+        list: names of the benchmarks that regressed.
+    """
+    regressed = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        change = result["items_per_s"] / before["items_per_s"] - 1 if before["items_per_s"] else 0.0
+        p95 = result["latency_us"]["p95"] / before["latency_us"]["p95"] - 1 if before["latency_us"]["p95"] else 0.0
+        flag = ""
+        if change < -threshold:
+            regressed.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:18} throughput {change:+7.1%}  p95 latency {p95:+7.1%}{flag}")
+    return regressed
+
+
+BENCHMARKS = ("decode", "log", "plot", "plot_long", "lut_parse", "lut_incremental", "deviations", "stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the JDx hot paths.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="benchmarks to run, defaults to all")
+    parser.add_argument("--frames", type=int, default=100000, help="frames for the decode, log and plot benchmarks")
+    parser.add_argument("--capture", help="JDx_display text log to take the frames from, instead of the emulator")
+    parser.add_argument("--lut", help="raw LUT dump (a JDx_fleet lut.txt) to use instead of the emulator's")
+    parser.add_argument("--device", help="port or URL of a device for the stream benchmark, defaults to an emulator")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds of the stream benchmark")
+    parser.add_argument("--odr", type=float, default=BENCHMARK_ODR, help="emulator ODR for the stream benchmark")
+    parser.add_argument("--output", help="JSON file to save the results to")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="throughput drop that counts as a regression, exits with status 1",
+    )
+    args = parser.parse_args()
+
+    frames = canned_frames(args.frames, args.capture)
+    lines = canned_lut(args.lut)
+    directory = tempfile.mkdtemp(prefix="jdx_benchmark_")
+    benchmarks = {
+        "decode": lambda: bench_decode(frames),
+        "log": lambda: bench_log(frames, directory),
+        "plot": lambda: bench_plot(frames[:20000], directory),
+        "plot_long": lambda: bench_plot(frames[:20000], directory, LONG_HISTORY_SECONDS),
+        "lut_parse": lambda: bench_lut_parse(lines),
+        "lut_incremental": lambda: bench_lut_incremental(lines),
+        "deviations": lambda: bench_deviations(lines),
+        "stream": lambda: bench_stream(args.duration, args.odr, args.device),
+    }
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        result = benchmarks[name]()
+        results[name] = result
+        latency = result["latency_us"]
+        print(
+            f"{name:18} {result['items_per_s']:12.0f} items/s  "
+            f"p50 {latency['p50']:9.1f} us  p95 {latency['p95']:9.1f} us  "
+            f"p99 {latency['p99']:9.1f} us  max {latency['max']:9.1f} us"
+        )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"environment": environment(), "results": results}, file, indent=4)
+        print(f"Saved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import collections
+import hashlib
+import json
+import os
+
+import numpy
+
+from JDx_lut import LUT_DTYPE
+
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".jdx_lut_cache")
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# what makes a LUT unique: a sensor only gets a new table when it is recalibrated or reflashed.
+Sensor_Identity = collections.namedtuple(
+    "Sensor_Identity", ["model", "serial_no", "fw_version", "mfg_date"]
+)
+
+
+def sensor_identity(reply: str) -> Sensor_Identity:
+    """pick the identity out of a ;000,q,q reply.
+
+    Args:
+        reply (str): response to ;000,q,q.
+
+    Raises:
+        ValueError: the reply is too short or malformed.
+
+    Returns:
+        Sensor_Identity: identity of the sensor.
+    """
+    data = reply.strip().replace("+", "").split(",")
+    try:
+        return Sensor_Identity(
+            data[4], data[5], data[6].split(" ")[1], data[10].split("=")[1]
+        )
+    except IndexError:
+        raise ValueError(f"Could not identify the sensor from {reply!r}")
+
+
+class LUT_Cache:
+    """LUTs already downloaded, stored on disk by sensor identity.
+
+    Each entry is one .npz file holding the LUT array and its calibration temperatures. Hits refresh the entry's
+    modification time, and the least recently used entries are deleted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        """
+        Args:
+            directory (str, optional): cache directory, created on the first store. Defaults to CACHE_DIR.
+            max_bytes (int, optional): size the cache is trimmed to. Defaults to CACHE_MAX_BYTES.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def entry_path(self, identity: Sensor_Identity) -> str:
+        """file that holds the LUT of a sensor.
+
+        Args:
+            identity (Sensor_Identity): identity of the sensor.
+
+        Returns:
+            str: path of the cache entry.
+        """
+        key = hashlib.sha1("|".join(identity).encode()).hexdigest()[:16]
+        name = "".join(c if c.isalnum() else "_" for c in identity.serial_no)
+        return os.path.join(self.directory, f"{name}_{key}.npz")
+
+    def load(self, identity: Sensor_Identity) -> tuple:
+        """look up the LUT of a sensor.
+
+        Args:
+            identity (Sensor_Identity): identity of the sensor.
+
+        Returns:
+            tuple: (lut array, cal temps dict), or None when there is no entry.
+        """
+        path = self.entry_path(identity)
+        try:
+            with numpy.load(path) as entry:
+                meta = json.loads(str(entry["meta"]))
+                lut = entry["lut"].astype(LUT_DTYPE)
+        except (OSError, KeyError, ValueError):
+            return None
+        if meta.get("identity") != list(identity):
+            return None
+        os.utime(path)
+        return lut, meta["cal_temps"]
+
+    def lut_points(self, identity: Sensor_Identity) -> int:
+        """size of the cached LUT of a sensor, or of the latest cached LUT of the same model, so a download can show
+        its progress. Unlike load, this does not count as a hit.
+
+        Args:
+            identity (Sensor_Identity): identity of the sensor.
+
+        Returns:
+            int: number of LUT points, None when no LUT of the model is cached.
+        """
+        own = os.path.basename(self.entry_path(identity))
+        entries = []
+        try:
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"):
+                    status = os.stat(os.path.join(self.directory, name))
+                    entries.append((name == own, status.st_mtime, name))
+        except OSError:
+            return None
+        # the sensor's own entry first, then the most recently used.
+        for _, _, name in sorted(entries, reverse=True):
+            try:
+                with numpy.load(os.path.join(self.directory, name)) as entry:
+                    meta = json.loads(str(entry["meta"]))
+                    if meta["identity"][0] == identity.model:
+                        return len(entry["lut"])
+            except (OSError, KeyError, ValueError):
+                continue
+        return None
+
+    def store(self, identity: Sensor_Identity, lut: numpy.ndarray, cal_temps: dict) -> None:
+        """save the LUT of a sensor and trim the cache.
+
+        Args:
+            identity (Sensor_Identity): identity of the sensor.
+            lut (numpy.ndarray): parsed LUT.
+            cal_temps (dict): calibration temps from the LUT headers.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        meta = {"identity": list(identity), "cal_temps": cal_temps}
+        path = self.entry_path(identity)
+        # write then rename, so a crash never leaves a half written entry behind.
+        temporary = path + ".tmp.npz"
+        numpy.savez(temporary, lut=lut, meta=numpy.array(json.dumps(meta)))
+        os.replace(temporary, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """delete the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                status = os.stat(os.path.join(self.directory, name))
+                entries.append((status.st_mtime, status.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
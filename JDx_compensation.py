@@ -0,0 +1,123 @@
+import numpy
+
+from JDx_lut import AXES, TEMP_INDICES, lut_table
+
+
+CHUNK_SIZE = 1 << 20  # samples compensated per pass, bounds the temporaries for very long inputs.
+
+
+class Compensation_Engine:
+    """turn raw ADC counts and temperatures into compensated angles on the host, the way the sensor does.
+
+    For each axis the counts are interpolated in the counts to angle table of each calibration temperature, those
+    three angles are interpolated at the sample temperature, and the orthonormalization matrix and offsets are then
+    applied to the (x, y, 0) vector as matrix @ (vector - offsets).
+
+    Counts outside a table and temperatures outside the calibration range are clamped to the nearest end, as
+    extrapolating a calibration is rarely better than holding it.
+    """
+
+    def __init__(self, lut: numpy.ndarray, cal_temps: dict, matrix=None, offsets=None):
+        """prepare the tables.
+
+        Args:
+            lut (numpy.ndarray): parsed LUT, see JDx_lut.parse_lut.
+            cal_temps (dict): axis to the three calibration temps, as returned by parse_lut.
+            matrix (array-like, optional): 3x3 orthonormalization matrix, matrix[row][column]. Defaults to identity.
+            offsets (array-like, optional): x, y and z offsets. Defaults to zeros.
+
+        Raises:
+            ValueError: an axis has an empty table or no calibration temps.
+        """
+        self.matrix = numpy.eye(3) if matrix is None else numpy.asarray(matrix, dtype=numpy.float64)
+        self.offsets = numpy.zeros(3) if offsets is None else numpy.asarray(offsets, dtype=numpy.float64)
+
+        self.tables = {}  # axis to [(counts, angles) sorted by counts, one per calibration temp]
+        self.temps = {}  # axis to calibration temps, ascending
+        for axis in AXES:
+            if axis not in cal_temps:
+                raise ValueError(f"No calibration temps for the {axis} axis")
+            temps = numpy.array([float(temp) for temp in cal_temps[axis]])
+            order = numpy.argsort(temps)
+            tables = []
+            for temp_index in numpy.array(TEMP_INDICES)[order]:
+                table = lut_table(lut, axis, temp_index)
+                if len(table) == 0:
+                    raise ValueError(f"The {axis} axis has no table for temp {temp_index + 1}")
+                by_counts = numpy.argsort(table["counts"], kind="stable")
+                tables.append((table["counts"][by_counts], table["angle"][by_counts]))
+            self.tables[axis] = tables
+            self.temps[axis] = temps[order]
+
+    @classmethod
+    def from_settings(cls, lut: numpy.ndarray, cal_temps: dict, settings) -> "Compensation_Engine":
+        """build the engine from a LUT and the settings dumped from the same sensor.
+
+        Args:
+            lut (numpy.ndarray): parsed LUT.
+            cal_temps (dict): calibration temps from the LUT headers.
+            settings (JDx_Settings): settings holding the matrix and offsets.
+
+        Returns:
+            Compensation_Engine: the engine.
+        """
+        return cls(lut, cal_temps, settings.matrix, settings.offsets)
+
+    def axis_angles(self, axis: str, counts, temperature) -> numpy.ndarray:
+        """LUT angle of one axis, before the matrix and offsets.
+
+        Args:
+            axis (str): "X" or "Y".
+            counts (array-like): raw ADC counts.
+            temperature (array-like): temperature of each sample, deg C.
+
+        Returns:
+            numpy.ndarray: angles, arc-deg.
+        """
+        counts = numpy.asarray(counts, dtype=numpy.float64)
+        temps = self.temps[axis]
+        # angle of every sample at each calibration temp, shape (3, n).
+        angles = numpy.stack(
+            [numpy.interp(counts, table_counts, table_angles) for table_counts, table_angles in self.tables[axis]]
+        )
+
+        temperature = numpy.broadcast_to(numpy.asarray(temperature, dtype=numpy.float64), counts.shape)
+        upper = numpy.clip(numpy.searchsorted(temps, temperature), 1, len(temps) - 1)
+        lower = upper - 1
+        span = temps[upper] - temps[lower]
+        weight = numpy.divide(
+            temperature - temps[lower], span, out=numpy.zeros_like(temperature), where=span != 0
+        )
+        weight = numpy.clip(weight, 0.0, 1.0)
+
+        low = numpy.take_along_axis(angles, lower[numpy.newaxis], axis=0)[0]
+        high = numpy.take_along_axis(angles, upper[numpy.newaxis], axis=0)[0]
+        return low + weight * (high - low)
+
+    def compensate(self, counts_x, counts_y, temperature, chunk_size: int = CHUNK_SIZE) -> tuple:
+        """compensated x and y angles of a batch of raw samples.
+
+        Args:
+            counts_x (array-like): raw x ADC counts. NumPy memmaps work, they are read one chunk at a time.
+            counts_y (array-like): raw y ADC counts.
+            temperature (array-like): temperature of each sample, deg C.
+            chunk_size (int, optional): samples per pass. Defaults to CHUNK_SIZE.
+
+        Returns:
+            tuple: (x, y) numpy arrays of compensated angles, arc-deg.
+        """
+        counts_x = numpy.asarray(counts_x)
+        counts_y = numpy.asarray(counts_y)
+        temperature = numpy.broadcast_to(numpy.asarray(temperature), counts_x.shape)
+        x = numpy.empty(counts_x.shape, dtype=numpy.float64)
+        y = numpy.empty(counts_x.shape, dtype=numpy.float64)
+
+        for start in range(0, len(counts_x), chunk_size):
+            part = slice(start, start + chunk_size)
+            vectors = numpy.zeros((3, len(counts_x[part])))
+            vectors[0] = self.axis_angles("X", counts_x[part], temperature[part])
+            vectors[1] = self.axis_angles("Y", counts_y[part], temperature[part])
+            corrected = self.matrix @ (vectors - self.offsets[:, numpy.newaxis])
+            x[part] = corrected[0]
+            y[part] = corrected[1]
+        return x, y
@@ -1,52 +1,48 @@
 import sys
 import os
 import datetime
+import time
 
-import serial
 import serial.tools.list_ports
 
 from PyQt5 import QtWidgets, uic, QtCore
 
+import numpy
 import pyqtgraph
 import pyqtgraph.exporters
 
 import about_window
-
-
-def open_serial_connection(port: str, baud: int, parity: str) -> serial.Serial:
-    """open serial port to JDx sensor.
-
-    Args:
-        port (str): physical serial port
-        baud (int): baud rate that sensor has
-        parity (str): parity of sensor
-
-    Returns:
-        serial.Serial: open serial port connection.
-    """
-    return serial.Serial(port, baud, parity=parity, timeout=5)
-
-
-def send_serial_data(connection: serial.Serial, packet: str) -> None:
-    """send serial data to device.
-
-    Args:
-        connection (serial.Serial): open serial connection
-        packet (str): data to send over connection.
-    """
-    connection.write(packet.encode())
-
-
-def read_serial_data(connection: serial.Serial) -> str:
-    """read serial data from connection.
-
-    Args:
-        connection (serial.Serial): open serial connection
-
-    Returns:
-        str: data returned from open serial connection
-    """
-    return connection.readline().decode("utf-8")
+from JDx_acquisition import (
+    BAUD_COMMAND,
+    CANCEL_DRAIN_TIME,
+    FAST_BAUD_RATES,
+    LUT_Download_Worker,
+    discard_input,
+)
+from JDx_cache import LUT_Cache, sensor_identity
+from JDx_export import plot_paths
+from JDx_log import JDx_Log_Writer
+from JDx_lut import (
+    DEVIATION_DTYPE,
+    LUT_DTYPE,
+    compute_deviations,
+    deviation_curve,
+    lut_curve,
+    number_points,
+    parse_lut,
+)
+from JDx_render import Decimating_Curve
+from JDx_settings import SETTINGS_COMMANDS, parse_settings
+from JDx_transport import (
+    command_name,
+    open_serial_connection,
+    query_batch,
+    query_serial_data,
+)
+
+
+# seconds closing the window waits for a cancelled LUT download to hand the port back.
+CLOSE_TIMEOUT = 2 * CANCEL_DRAIN_TIME
 
 
 class JDx_Configuration_Window(QtWidgets.QMainWindow):
@@ -78,6 +74,24 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
         self.actionSave = self.findChild(QtWidgets.QAction, "actionSave")
         self.actionSave.triggered.connect(self.dump_settings)
 
+        self.actExportLatency = self.findChild(QtWidgets.QAction, "actionExport_Latency")
+        self.actExportLatency.triggered.connect(self.export_latency)
+
+        # skip the LUT cache and download the LUT from the sensor again.
+        self.actForceRefresh = self.findChild(QtWidgets.QAction, "actionForce_LUT_Refresh")
+        self.lut_cache = LUT_Cache()
+        # dump the LUT at the fastest baud the sensor accepts, and return to the selected one afterwards.
+        self.actFastDump = self.findChild(QtWidgets.QAction, "actionFast_LUT_Dump")
+        # only offered once a verified baud change command is configured.
+        self.actFastDump.setVisible(BAUD_COMMAND is not None)
+        self.identity = None
+        self.settings = None  # JDx_Settings of the last settings dump
+
+        self.actDeviationReference = self.findChild(
+            QtWidgets.QAction, "actionDeviation_Reference"
+        )
+        self.actDeviationReference.triggered.connect(self.select_deviation_reference)
+
         ############################################################################
 
         # BUTTONS
@@ -94,6 +108,7 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
 
         self.dump_lut_pb = self.findChild(QtWidgets.QPushButton, "dump_lut_pb")
         self.dump_lut_pb.clicked.connect(self.update_plot)
+        self.dump_lut_text = self.dump_lut_pb.text()
 
         self.dump_settings_pb = self.findChild(
             QtWidgets.QPushButton, "dump_settings_pb"
@@ -167,6 +182,10 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
         date_time = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
         filepath = os.path.join(self.base, f"JDx_log_{date_time}.txt")
         self.log_filepath_le.setText(filepath)
+        self.log_writer = JDx_Log_Writer(filepath)
+        self.log_filepath_le.editingFinished.connect(
+            lambda: self.log_writer.set_path(self.log_filepath_le.text())
+        )
 
         ############################################################################
 
@@ -216,41 +235,24 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
         self.plot.showGrid(x=True, y=True)
         self.plot.setYRange(angle_limit_low, angle_limit_high)
         self.plot.setXRange(-300, 300)
-        # seed the plot data prior to starting.
-        N = 1
-        self.counts_x_temp_1 = list(range(N))
-        self.lut_x_temp_1 = list(range(N))
-        self.diff_x_temp_1 = list(range(N))
-
-        self.counts_y_temp_1 = list(range(N))
-        self.lut_y_temp_1 = list(range(N))
-        self.diff_y_temp_1 = list(range(N))
+        # the LUT is held in one structured array (see JDx_lut), the plots start empty.
+        self.lut = numpy.empty(0, dtype=LUT_DTYPE)
+        self.cal_temps = {}
+        empty = []
+
         pen_x_temp_1 = pyqtgraph.mkPen(color=(29, 212, 8))
         pen_y_temp_1 = pyqtgraph.mkPen(color=(207, 203, 4))
 
-        self.counts_x_temp_2 = list(range(N))
-        self.lut_x_temp_2 = list(range(N))
-        self.diff_x_temp_2 = list(range(N))
-        self.counts_y_temp_2 = list(range(N))
-        self.lut_y_temp_2 = list(range(N))
-        self.diff_y_temp_2 = list(range(N))
-
         pen_x_temp_2 = pyqtgraph.mkPen(color=(237, 79, 74))
         pen_y_temp_2 = pyqtgraph.mkPen(color=(54, 235, 232))
 
-        self.counts_x_temp_3 = list(range(N))
-        self.lut_x_temp_3 = list(range(N))
-        self.diff_x_temp_3 = list(range(N))
-        self.counts_y_temp_3 = list(range(N))
-        self.lut_y_temp_3 = list(range(N))
-        self.diff_y_temp_3 = list(range(N))
         pen_x_temp_3 = pyqtgraph.mkPen(color=(240, 113, 238))
         pen_y_temp_3 = pyqtgraph.mkPen(color=(108, 101, 240))
 
         # Get a line reference
         self.line_x_temp_1 = self.plot.plot(
-            self.counts_x_temp_1,
-            self.lut_x_temp_1,
+            empty,
+            empty,
             name="X Data Temp 1",
             pen=pen_x_temp_1,
             symbol="+",
@@ -258,8 +260,8 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
             symbolBrush="b",
         )
         self.line_y_temp_1 = self.plot.plot(
-            self.counts_y_temp_1,
-            self.lut_y_temp_1,
+            empty,
+            empty,
             name="Y Data Temp 1",
             pen=pen_y_temp_1,
             symbol="+",
@@ -268,8 +270,8 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
         )
 
         self.line_x_temp_2 = self.plot.plot(
-            self.counts_x_temp_2,
-            self.lut_x_temp_2,
+            empty,
+            empty,
             name="X Data Temp 2",
             pen=pen_x_temp_2,
             symbol="+",
@@ -277,8 +279,8 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
             symbolBrush="b",
         )
         self.line_y_temp_2 = self.plot.plot(
-            self.counts_y_temp_2,
-            self.lut_y_temp_2,
+            empty,
+            empty,
             name="Y Data Temp 1",
             pen=pen_y_temp_2,
             symbol="+",
@@ -287,8 +289,8 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
         )
 
         self.line_x_temp_3 = self.plot.plot(
-            self.counts_x_temp_3,
-            self.lut_x_temp_3,
+            empty,
+            empty,
             name="X Data Temp 3",
             pen=pen_x_temp_3,
             symbol="+",
@@ -296,8 +298,8 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
             symbolBrush="b",
         )
         self.line_y_temp_3 = self.plot.plot(
-            self.counts_y_temp_3,
-            self.lut_y_temp_3,
+            empty,
+            empty,
             name="Y Data Temp 3",
             pen=pen_y_temp_3,
             symbol="+",
@@ -306,8 +308,8 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
         )
 
         self.line_x_diff_1 = self.diff_plot.plot(
-            self.counts_x_temp_1,
-            self.diff_x_temp_1,
+            empty,
+            empty,
             name="Deviation X Data Temp 1",
             pen=pen_x_temp_1,
             symbol="+",
@@ -315,8 +317,8 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
             symbolBrush="b",
         )
         self.line_y_diff_1 = self.diff_plot.plot(
-            self.counts_y_temp_1,
-            self.diff_y_temp_1,
+            empty,
+            empty,
             name="Deviation Y Data Temp 1",
             pen=pen_y_temp_1,
             symbol="+",
@@ -325,8 +327,8 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
         )
 
         self.line_x_diff_2 = self.diff_plot.plot(
-            self.counts_x_temp_2,
-            self.diff_x_temp_2,
+            empty,
+            empty,
             name="Deviation X Data Temp 2",
             pen=pen_x_temp_2,
             symbol="+",
@@ -334,8 +336,8 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
             symbolBrush="b",
         )
         self.line_y_diff_2 = self.diff_plot.plot(
-            self.counts_y_temp_2,
-            self.diff_y_temp_2,
+            empty,
+            empty,
             name="Deviation Y Data Temp 2",
             pen=pen_y_temp_2,
             symbol="+",
@@ -344,8 +346,8 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
         )
 
         self.line_x_diff_3 = self.diff_plot.plot(
-            self.counts_x_temp_3,
-            self.diff_x_temp_3,
+            empty,
+            empty,
             name="Deviation X Data Temp 3",
             pen=pen_x_temp_3,
             symbol="+",
@@ -353,8 +355,8 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
             symbolBrush="b",
         )
         self.line_y_diff_3 = self.diff_plot.plot(
-            self.counts_y_temp_3,
-            self.diff_y_temp_3,
+            empty,
+            empty,
             name="Deviation Y Data Temp 3",
             pen=pen_y_temp_3,
             symbol="+",
@@ -362,16 +364,43 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
             symbolBrush="b",
         )
 
+        # plot lines by (axis, temp index), drawn decimated to the plot width.
+        self.lut_lines = {
+            ("X", 0): Decimating_Curve(self.line_x_temp_1),
+            ("Y", 0): Decimating_Curve(self.line_y_temp_1),
+            ("X", 1): Decimating_Curve(self.line_x_temp_2),
+            ("Y", 1): Decimating_Curve(self.line_y_temp_2),
+            ("X", 2): Decimating_Curve(self.line_x_temp_3),
+            ("Y", 2): Decimating_Curve(self.line_y_temp_3),
+        }
+        self.diff_lines = {
+            ("X", 0): Decimating_Curve(self.line_x_diff_1),
+            ("Y", 0): Decimating_Curve(self.line_y_diff_1),
+            ("X", 1): Decimating_Curve(self.line_x_diff_2),
+            ("Y", 1): Decimating_Curve(self.line_y_diff_2),
+            ("X", 2): Decimating_Curve(self.line_x_diff_3),
+            ("Y", 2): Decimating_Curve(self.line_y_diff_3),
+        }
+
+        # picks up the lines of a LUT download while it runs.
         self.timer = QtCore.QTimer(self)
         self.timer.setInterval(100)
-        self.timer.timeout.connect(self.update_plot)
-
-        self.deviations_x_temp_1 = []
-        self.deviations_y_temp_1 = []
-        self.deviations_x_temp_2 = []
-        self.deviations_y_temp_2 = []
-        self.deviations_x_temp_3 = []
-        self.deviations_y_temp_3 = []
+        self.timer.timeout.connect(self.poll_lut_download)
+        self.lut_worker = None
+        # a cancelled download left the sensor sending the rest of the dump, see lut_download_running.
+        self.resync_needed = False
+        self.lut_dump = []
+        self.expected_lut_points = None
+
+        self.statusbar = self.findChild(QtWidgets.QStatusBar, "statusbar")
+        self.progress_pb = QtWidgets.QProgressBar()
+        self.progress_pb.setMaximumWidth(300)
+        self.progress_pb.hide()
+        self.statusbar.addPermanentWidget(self.progress_pb)
+
+        # deviations are recomputed from self.lut on every plot.
+        self.reference_temp_index = 1
+        self.deviations = numpy.empty(0, dtype=DEVIATION_DTYPE)
 
         self.connected_to_sensor = False
 
@@ -384,73 +413,34 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
 
     def dump_settings(self):
         """
-        Summary: this method sends some query commands to the JDx sensor and loads the results into the respective line edits.
+        Summary: this method sends the settings queries to the JDx sensor in one batch and loads the parsed results
+        into the respective line edits.
         """
 
+        if self.lut_download_running():
+            return
+
         self.message_te.append("Dumping settings from the sensor.")
 
-        data = self.query_and_log_response(";000,q,q\r\n")
-        data = data.split(",")
-
-        self.model_le.setText(data[4])
-        self.mfg_date_le.setText(data[10].split("=")[1])
-        self.serial_no_le.setText(data[5])
-        self.fw_version_le.setText(data[6].split(" ")[1])
-        self.decimation_le.setText(data[21].split("=")[1])
-        streaming_status = "On" if int(data[14].split("=")[1]) == 1 else "Off"
-        test_mode_status = "On" if int(data[15].split("=")[1]) == 1 else "Off"
-        self.streaming_status_le.setText(streaming_status)
-        self.test_mode_le.setText(test_mode_status)
-        self.relative_offset_le.setText(data[17].split("=")[1])
-
-        self.temp_sensor_gain_le.setText(data[18].split("=")[1])
-        self.temp_sensor_offset_le.setText(data[19].split("=")[1])
-        self.odr_le.setText(data[20].split("=")[1])
-
-        data = self.query_and_log_response(";000,q,gf\r\n")
-        data = data.split(",")
-        self.g_vector_le.setText(data[3].split(":")[1].replace(" ", ""))
-
-        data = self.query_and_log_response(";000,q,be\r\n")
-        data = data.split(",")
-        self.maf_le.setText(data[4])
-        data = self.query_and_log_response(";000,q,bl\r\n")
-        data = data.split(",")
-        self.maf_length_le.setText(data[3])
-        data = self.query_and_log_response(";000,q,b\r\n")
-        data = data.split(",")
-        self.bandwidth_le.setText(data[5])
-
-        data = self.query_and_log_response(";000,q,gf\r\n")
-        data = data.split(",")
-        self.g_vector_le.setText(data[3].split(":")[1].replace(" ", ""))
-
-        # get the orthorenormalization matrix
-        for i in range(3):
-            data = self.query_and_log_response(
-                f";000,q,ma{i}\r\n"
-            )  # get orthonormalization matrix
-            # parse the data string.
-            data = data.replace(" ", "").split(":")[1].split(",")
-            if i == 0:
-                self.c_xx_le.setText(f"{float(data[0]):.5f}")
-                self.c_yx_le.setText(f"{float(data[1]):.5f}")
-                self.c_zx_le.setText(f"{float(data[2]):.5f}")
-            elif i == 1:
-                self.c_xy_le.setText(f"{float(data[0]):.5f}")
-                self.c_yy_le.setText(f"{float(data[1]):.5f}")
-                self.c_zy_le.setText(f"{float(data[2]):.5f}")
-            else:
-                self.c_xz_le.setText(f"{float(data[0]):.5f}")
-                self.c_yz_le.setText(f"{float(data[1]):.5f}")
-                self.c_zz_le.setText(f"{float(data[2]):.5f}")
-
-        data = self.query_and_log_response(";000,q,mb\r\n")
-        data = data.replace(" ", "").split(":")[1].split(",")
-
-        self.O_x_le.setText(f"{float(data[0]):.5f}")
-        self.O_y_le.setText(f"{float(data[1]):.5f}")
-        self.O_z_le.setText(f"{float(data[2]):.5f}")
+        responses = query_batch(self.sensor, SETTINGS_COMMANDS)
+        self.log_writer.write_lines(
+            [responses[command].replace("+", "").rstrip("\r\n") for command in responses]
+        )
+        self.log_writer.flush()
+
+        missing = [command for command in SETTINGS_COMMANDS if command not in responses]
+        if missing:
+            self.message_te.append(f"No response to {', '.join(missing)}")
+            return
+        try:
+            self.settings = parse_settings(responses)
+        except (IndexError, ValueError) as error:
+            self.message_te.append(f"Could not parse the settings: {error}")
+            return
+
+        for name, text in self.settings.widget_text().items():
+            getattr(self, f"{name}_le").setText(text)
+        self.show_latency(command_name(SETTINGS_COMMANDS[0]))
 
     def query_and_log_response(self, arg: str) -> str:
         """send ascii data to sensor through serial port and read/log to file the response.
@@ -462,144 +452,265 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
             str: response from the sensor.
         """
         # query the basic stuff
-        send_serial_data(self.sensor, arg)
-        result = read_serial_data(self.sensor).replace("+", "")
-        with open(self.log_filepath_le.text(), "a") as file:
-            date_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            file.write(f"{date_time} - {result}")
+        result = query_serial_data(self.sensor, arg).replace("+", "")
+        self.log_writer.write(result.rstrip("\r\n"))
+        self.show_latency(command_name(arg))
 
         return result
 
-    def get_cal_temps(self, data: str) -> None:
-        """parse the data string and get the temps at which the sensor was calibrated. These values come from the
-        LUT output.
-
+    def show_latency(self, command: str) -> None:
+        """show the round trip statistics of a command type in the status bar.
 
         Args:
-            data (str): line from the LUT output stream.
-        """
-        if "Axis Temperatures" in data:
-            if "X Axis" in data:
-                data = data.split(",")
-                temp_1 = data[1].split(":")[1].replace(" ", "")
-                temp_2 = data[2]
-                temp_3 = data[3]
-                self.x_cal_temp_1.setText(temp_1)
-                self.x_cal_temp_2.setText(temp_2)
-                self.x_cal_temp_3.setText(temp_3)
-            elif "Y Axis" in data:
-                data = data.split(",")
-                temp_1 = data[1].split(":")[1].replace(" ", "")
-                temp_2 = data[2]
-                temp_3 = data[3]
-                self.y_cal_temp_1.setText(temp_1)
-                self.y_cal_temp_2.setText(temp_2)
-                self.y_cal_temp_3.setText(temp_3)
-
-    def get_lut_from_sensor(self):
+            command (str): command type, such as "q,q".
         """
-        get the LUT from the sensor. The data will hammer the serial port until the "success,end of LUT" massage appears.
-        """
-        self.counts_x_temp_1 = []
-        self.lut_x_temp_1 = []
-        self.counts_y_temp_1 = []
-        self.lut_y_temp_1 = []
-
-        self.counts_x_temp_2 = []
-        self.lut_x_temp_2 = []
-        self.counts_y_temp_2 = []
-        self.lut_y_temp_2 = []
-
-        self.counts_x_temp_3 = []
-        self.lut_x_temp_3 = []
-        self.counts_y_temp_3 = []
-        self.lut_y_temp_3 = []
-
-        N = 0.001  # scaling for the ADC counts to a more friendly scale.
-
-        # self.timer.start()
-        send_serial_data(self.sensor, ";000,?\r\n")  # get the lut.
-        while True:
-            data = read_serial_data(self.sensor).replace("+", "")
-            with open(self.log_filepath_le.text(), "a") as file:
-                date_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                file.write(f"{date_time} - {data}")
-
-            if "057,?,success,end of LUT" in data or "Z Axis" in data:
-                break
-            self.get_cal_temps(data)
-
-            data = data.split(",")
-
-            if data[2] == "0":  # temp index
-                if data[1] == "X":  # axis index
-                    self.counts_x_temp_1.append(N * float(data[4]))
-                    self.lut_x_temp_1.append(float(data[5]))
-                elif data[1] == "Y":
-                    self.counts_y_temp_1.append(N * float(data[4]))
-                    self.lut_y_temp_1.append(float(data[5]))
-            elif data[2] == "1":
-                if data[1] == "X":
-                    self.counts_x_temp_2.append(N * float(data[4]))
-                    self.lut_x_temp_2.append(float(data[5]))
-                elif data[1] == "Y":
-                    self.counts_y_temp_2.append(N * float(data[4]))
-                    self.lut_y_temp_2.append(float(data[5]))
-
-            elif data[2] == "2":
-                if data[1] == "X":
-                    self.counts_x_temp_3.append(N * float(data[4]))
-                    self.lut_x_temp_3.append(float(data[5]))
-                elif data[1] == "Y":
-                    self.counts_y_temp_3.append(N * float(data[4]))
-                    self.lut_y_temp_3.append(float(data[5]))
+        histogram = self.sensor.latency.histograms.get(command)
+        if histogram is not None:
+            self.statusbar.showMessage(f"{command}: {histogram.summary()}")
 
-    def get_deviations(self):
+    def export_latency(self):
         """
-        Compute and plot the deviations for all the LUT points from room temp.
+        save the round trip histograms of every command sent to the sensor to a JSON file next to the log.
         """
-        self.nominal_x = self.counts_x_temp_2
-        self.nominal_y = self.counts_y_temp_2
-        for i in range(len(self.counts_x_temp_1)):
-            self.deviations_x_temp_1.append(self.nominal_x[i] - self.counts_x_temp_1[i])
-            self.deviations_y_temp_1.append(self.nominal_y[i] - self.counts_y_temp_1[i])
+        if self.connected_to_sensor is not True:
+            self.message_te.append("Not connected to the sensor.")
+            return
+        path = os.path.splitext(self.log_writer.path)[0] + "_latency.json"
+        self.sensor.latency.export(path)
+        self.message_te.append(self.sensor.latency.summary())
+        self.message_te.append(f"Exported latency histograms to {path}")
 
-            self.deviations_x_temp_2.append(self.nominal_x[i] - self.counts_x_temp_2[i])
-            self.deviations_y_temp_2.append(self.nominal_y[i] - self.counts_y_temp_2[i])
+    def show_cal_temps(self, cal_temps: dict) -> None:
+        """load the temps at which the sensor was calibrated into the line edits. These values come from the
+        "Axis Temperatures" headers of the LUT output.
 
-            self.deviations_x_temp_3.append(self.nominal_x[i] - self.counts_x_temp_3[i])
-            self.deviations_y_temp_3.append(self.nominal_y[i] - self.counts_y_temp_3[i])
+        Args:
+            cal_temps (dict): axis to [temp 1, temp 2, temp 3], as returned by parse_lut.
+        """
+        if "X" in cal_temps:
+            temp_1, temp_2, temp_3 = cal_temps["X"]
+            self.x_cal_temp_1.setText(temp_1)
+            self.x_cal_temp_2.setText(temp_2)
+            self.x_cal_temp_3.setText(temp_3)
+        if "Y" in cal_temps:
+            temp_1, temp_2, temp_3 = cal_temps["Y"]
+            self.y_cal_temp_1.setText(temp_1)
+            self.y_cal_temp_2.setText(temp_2)
+            self.y_cal_temp_3.setText(temp_3)
 
-    def update_plot(self):
+    def get_lut_from_sensor(self):
         """
-        update each plot with data and lines.
+        start downloading the LUT from the sensor on a worker thread. The data will hammer the serial port until the
+        "success,end of LUT" massage appears. Lines are picked up by poll_lut_download as they arrive.
         """
+        self.lut = numpy.empty(0, dtype=LUT_DTYPE)
+        self.lut_dump = []
+
+        if self.identity is not None:
+            # a LUT of this sensor or its model in the cache sizes the progress bar from the first download on.
+            self.expected_lut_points = self.lut_cache.lut_points(self.identity) or self.expected_lut_points
+        rates = FAST_BAUD_RATES if self.actFastDump.isVisible() and self.actFastDump.isChecked() else None
+        self.lut_worker = LUT_Download_Worker(self.sensor, fast_baud_rates=rates)
+        self.lut_worker.start()
+        self.timer.start()
+
+        self.dump_lut_pb.setText("Cancel LUT Download")
+        self.progress_pb.setValue(0)
+        if self.expected_lut_points:
+            self.progress_pb.setRange(0, self.expected_lut_points)
+        else:
+            self.progress_pb.setRange(0, 0)  # busy indicator when no LUT of this model was seen yet.
+        self.progress_pb.show()
 
+    def poll_lut_download(self):
+        """
+        timer slot: take the LUT lines received so far, log them and add them to the plots.
+        """
+        # checked before taking the lines, so the last batch of a worker that just stopped is not left behind.
+        finished = not self.lut_worker.is_alive()
+        for error in self.lut_worker.take_errors():
+            self.message_te.append(error)
+
+        lines = self.lut_worker.take_lines()
+        if lines:
+            self.log_writer.write_lines(lines)
+            self.lut_dump.extend(lines)
+            chunk, cal_temps = parse_lut(lines)
+            self.lut = number_points(numpy.concatenate((self.lut, chunk)))
+            self.cal_temps.update(cal_temps)
+            self.show_cal_temps(cal_temps)
+            self.plot_lut()
+            self.show_lut_progress()
+
+        if finished:
+            self.finish_lut_download()
+
+    def show_lut_progress(self):
+        """
+        show points downloaded, points/s and the time left in the status bar.
+        """
+        points = len(self.lut)
+        elapsed = time.monotonic() - self.lut_worker.started_at
+        rate = points / elapsed if elapsed > 0 else 0.0
+        status = f"LUT: {points} points, {rate:.0f} points/s"
+        if self.expected_lut_points:
+            self.progress_pb.setValue(min(points, self.expected_lut_points))
+            if rate > 0:
+                remaining = max(self.expected_lut_points - points, 0) / rate
+                status += f", about {remaining:.0f} s left"
+        self.statusbar.showMessage(status)
+
+    def finish_lut_download(self):
+        """
+        wrap up once the worker has stopped: parse the whole dump, cache it and redraw.
+        """
+        self.timer.stop()
+        self.progress_pb.hide()
+        self.dump_lut_pb.setText(self.dump_lut_text)
+        self.dump_lut_pb.setEnabled(True)
+        self.log_writer.flush()
+        worker = self.lut_worker
+        self.lut_worker = None
+
+        elapsed = time.monotonic() - worker.started_at
+        if worker.cancelled:
+            self.message_te.append("LUT download cancelled.")
+            if worker.resync_needed:
+                self.resync_needed = True
+                self.message_te.append(
+                    "The sensor is still sending the rest of the LUT, it is discarded before the next command."
+                )
+        elif worker.completed:
+            self.lut, self.cal_temps = parse_lut(self.lut_dump)
+            self.expected_lut_points = len(self.lut)
+            self.message_te.append(
+                f"Downloaded {len(self.lut)} LUT points in {elapsed:.1f} s."
+            )
+            if worker.fast_baud_rates:
+                self.report_fast_dump(worker, elapsed)
+            if self.identity is not None and len(self.lut):
+                self.lut_cache.store(self.identity, self.lut, self.cal_temps)
+        self.statusbar.clearMessage()
+        self.plot_lut()
+
+    def report_fast_dump(self, worker: LUT_Download_Worker, elapsed: float) -> None:
+        """tell the user the throughput of a fast dump and how long the dump would have taken at the original baud.
+
+        Args:
+            worker (LUT_Download_Worker): the finished download.
+            elapsed (float): seconds the download took, baud changes included.
+        """
+        if worker.baud == worker.original_baud:
+            self.message_te.append(
+                f"The sensor did not accept a faster baud, dumped at {worker.original_baud}."
+            )
+            return
+        size = sum(len(line) + 2 for line in self.lut_dump)
+        saved = self.sensor.transfer_time(size, worker.original_baud) - elapsed
         self.message_te.append(
-            "Downloading LUT from sensor, this will take a few minutes."
+            f"Dumped at {worker.baud} baud: {size / elapsed / 1024:.1f} KiB/s, "
+            f"{saved:.1f} s saved over {worker.original_baud} baud."
         )
 
-        self.get_lut_from_sensor()
-
-        self.get_deviations()
+    def lut_download_running(self) -> bool:
+        """
+        check whether a LUT download owns the serial port, or a cancelled one is still arriving, and tell the user.
+        """
+        if self.lut_worker is not None:
+            self.message_te.append("Please wait for the LUT download to finish or cancel it.")
+            return True
+        if self.resync_needed:
+            if not discard_input(self.sensor, max_time=CANCEL_DRAIN_TIME):
+                self.message_te.append(
+                    "The sensor is still sending the cancelled LUT, please try again in a moment."
+                )
+                return True
+            self.resync_needed = False
+        return False
+
+    def load_cached_lut(self) -> bool:
+        """identify the sensor with ;000,q,q and load its LUT from the cache when there is an entry for it.
 
-        self.line_x_diff_1.setData(self.counts_x_temp_1, self.deviations_x_temp_1)
-        self.line_y_diff_1.setData(self.counts_y_temp_1, self.deviations_y_temp_1)
+        Returns:
+            bool: True when the LUT came from the cache.
+        """
+        try:
+            self.identity = sensor_identity(self.query_and_log_response(";000,q,q\r\n"))
+        except ValueError as e:
+            self.identity = None
+            self.message_te.append(f"{e}, not using the LUT cache.")
+            return False
+
+        if self.actForceRefresh.isChecked():
+            return False
+        cached = self.lut_cache.load(self.identity)
+        if cached is None:
+            return False
+
+        self.lut, self.cal_temps = cached
+        self.expected_lut_points = len(self.lut)
+        self.show_cal_temps(self.cal_temps)
+        self.message_te.append(
+            f"Loaded LUT of {self.identity.model} {self.identity.serial_no} from the cache. "
+            "Check Edit > Force LUT Refresh to download it again."
+        )
+        return True
 
-        self.line_x_diff_2.setData(self.counts_x_temp_2, self.deviations_x_temp_2)
-        self.line_y_diff_2.setData(self.counts_y_temp_2, self.deviations_y_temp_2)
+    def get_deviations(self):
+        """
+        Compute the deviations for all the LUT points from the reference temp, room temp unless the user picked another.
+        """
+        self.deviations = compute_deviations(self.lut, self.reference_temp_index)
 
-        self.line_x_diff_3.setData(self.counts_x_temp_3, self.deviations_x_temp_3)
-        self.line_y_diff_3.setData(self.counts_y_temp_3, self.deviations_y_temp_3)
+    def select_deviation_reference(self):
+        """
+        ask the user which calibration temp the deviations are computed against, and replot.
+        """
+        choices = ["Temp 1", "Temp 2", "Temp 3"]
+        choice, ok = QtWidgets.QInputDialog.getItem(
+            self,
+            "Deviation Reference",
+            "Compute deviations from:",
+            choices,
+            self.reference_temp_index,
+            False,
+        )
+        if ok:
+            self.reference_temp_index = choices.index(choice)
+            self.plot_lut()
 
-        self.line_x_temp_1.setData(self.counts_x_temp_1, self.lut_x_temp_1)
-        self.line_y_temp_1.setData(self.counts_y_temp_1, self.lut_y_temp_1)
+    def update_plot(self):
+        """
+        dump the LUT, from the cache or from the sensor, and plot it. Clicked again during a download, cancel it.
+        """
+        if self.lut_worker is not None:
+            self.lut_worker.cancel()
+            self.dump_lut_pb.setText("Cancelling LUT Download...")
+            self.dump_lut_pb.setEnabled(False)
+            self.statusbar.showMessage("Cancelling the LUT download")
+            return
+        if self.lut_download_running():
+            return
+
+        if self.load_cached_lut():
+            self.plot_lut()
+        else:
+            self.message_te.append(
+                "Downloading LUT from sensor, this will take a few minutes."
+            )
+            self.get_lut_from_sensor()
 
-        self.line_x_temp_2.setData(self.counts_x_temp_2, self.lut_x_temp_2)
-        self.line_y_temp_2.setData(self.counts_y_temp_2, self.lut_y_temp_2)
+    def plot_lut(self):
+        """
+        update each plot with data and lines.
+        """
+        self.get_deviations()
 
-        self.line_x_temp_3.setData(self.counts_x_temp_3, self.lut_x_temp_3)
-        self.line_y_temp_3.setData(self.counts_x_temp_3, self.lut_y_temp_3)
+        for (axis, temp_index), line in self.lut_lines.items():
+            line.set_data(*lut_curve(self.lut, axis, temp_index))
+            self.diff_lines[(axis, temp_index)].set_data(
+                *deviation_curve(self.deviations, axis, temp_index)
+            )
 
     def connect_to_sensor(self):
         """
@@ -625,11 +736,14 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
         """
         Send ascii data to sensor and read response.
         """
+        if self.lut_download_running():
+            return
         if self.connected_to_sensor is True:
             data = self.command_le.text()
-            send_serial_data(self.sensor, f"{data}\r\n")
-            data = read_serial_data(self.sensor)
+            command = f"{data}\r\n"
+            data = query_serial_data(self.sensor, command)
             self.message_te.append(data)
+            self.show_latency(command_name(command))
         else:
             self.message_te.append("Not connected to the sensor.")
 
@@ -638,21 +752,27 @@ class JDx_Configuration_Window(QtWidgets.QMainWindow):
         save plots to png files based on the serial number of the sensor.
         """
 
-        exporter_diff = pyqtgraph.exporters.ImageExporter(self.diff_plot.plotItem)
-        deviation_plot_file = os.path.join(
-            self.base, f"{self.serial_no_le.text()}_Deviations_plot.png"
+        # same names as JDx_export gives them, the deviation plot is named after its reference temp.
+        lut_plot_file, deviation_plot_file = plot_paths(
+            self.base, self.serial_no_le.text(), self.reference_temp_index
         )
+        exporter_diff = pyqtgraph.exporters.ImageExporter(self.diff_plot.plotItem)
         exporter_diff.export(deviation_plot_file)
 
         exporter = pyqtgraph.exporters.ImageExporter(self.plot.plotItem)
         # save to file
-        lut_plot_file = os.path.join(
-            self.base, f"{self.serial_no_le.text()}_LUT_plot.png"
-        )
         exporter.export(lut_plot_file)
 
         self.message_te.append(f"Finished exporting plots to {self.base}.")
 
+    def closeEvent(self, event):
+        if self.lut_worker is not None:
+            self.lut_worker.cancel()
+            # the worker is a daemon thread, it does not keep the app alive if the port is slow to hand back.
+            self.lut_worker.join(timeout=CLOSE_TIMEOUT)
+        self.log_writer.close()
+        super(JDx_Configuration_Window, self).closeEvent(event)
+
     def exit(self):
         """
         Close the app.
@@ -1,8 +1,8 @@
 import sys
 import os
 import datetime
+import time
 
-import serial
 import serial.tools.list_ports
 
 from PyQt5 import QtWidgets, uic, QtCore
@@ -10,42 +10,44 @@ from PyQt5 import QtWidgets, uic, QtCore
 import pyqtgraph
 
 import about_window
-
-
-def open_serial_connection(port: str, baud: int, parity: str) -> serial.Serial:
-    """open serial port to JDx sensor.
-
-    Args:
-        port (str): physical serial port
-        baud (int): baud rate that sensor has
-        parity (str): parity of sensor
-
-    Returns:
-        serial.Serial: open serial port connection.
-    """
-    return serial.Serial(port, baud, parity=parity, timeout=5)
-
-
-def send_serial_data(connection: serial.Serial, packet: str) -> None:
-    """send serial data to device.
-
-    Args:
-        connection (serial.Serial): open serial connection
-        packet (str): data to send over connection.
-    """
-    connection.write(packet.encode())
-
-
-def read_serial_data(connection: serial.Serial) -> str:
-    """read serial data from connection.
-
-    Args:
-        connection (serial.Serial): open serial connection
-
-    Returns:
-        str: data returned from open serial connection
-    """
-    return connection.readline().decode("utf-8")
+from JDx_cache import sensor_identity
+from JDx_log import SAMPLE_PRECISION, JDx_Log_Writer
+from JDx_recording import JDx_Recorder, recording_path_for
+from JDx_acquisition import (
+    CANCEL_DRAIN_TIME,
+    JDx_Acquisition_Worker,
+    LINK_CHECK_COMMAND,
+    POLL_COMMAND,
+    POLL_MODE,
+    POLL_INTERVAL,
+    STREAM_MODE,
+    STREAM_OFF_ATTEMPTS,
+    STREAM_OFF_COMMAND,
+    discard_input,
+)
+from JDx_history import Ring_Buffer, capacity_for
+from JDx_render import Decimating_Curve
+from JDx_settings import reply_odr
+from JDx_statistics import interval_statistics
+from JDx_transport import (
+    command_name,
+    open_serial_connection,
+    query_serial_data,
+)
+
+
+# latest samples the effective rate and read jitter are computed over.
+RATE_WINDOW = 256
+# samples/s the stream history is sized for when the sensor did not report its ODR, generous so the first second
+# of a fast stream is kept.
+STREAM_RATE_GUESS = 1000
+# default length of the plot history.
+HISTORY_SECONDS = 10
+# bytes the plot history may take. at 1000 samples/s that holds about an hour and a half.
+HISTORY_MEMORY = 256 * 2 ** 20
+HISTORY_COLUMNS = 3  # time, x angle and y angle
+# seconds the window waits for the acquisition worker to turn the stream off and hand the port back.
+STOP_TIMEOUT = (STREAM_OFF_ATTEMPTS + 1) * CANCEL_DRAIN_TIME
 
 
 class JDx_Display_Window(QtWidgets.QMainWindow):
@@ -70,9 +72,26 @@ class JDx_Display_Window(QtWidgets.QMainWindow):
         self.actSave = self.findChild(QtWidgets.QAction, "actionSave")
         self.actAbout.triggered.connect(self.save_messages)
 
+        self.actExportLatency = self.findChild(QtWidgets.QAction, "actionExport_Latency")
+        self.actExportLatency.triggered.connect(self.export_latency)
+        self.statusbar = self.findChild(QtWidgets.QStatusBar, "statusbar")
+
         self.actStream = self.findChild(QtWidgets.QAction, "actionLog_Data")
         self.actStream.triggered.connect(self.toggle_stream)
 
+        # continuous stream (;000,s,1) when checked, ;000,v,v polling otherwise.
+        self.actStreamMode = self.findChild(QtWidgets.QAction, "actionStream_Mode")
+
+        # record x, y, temperature to a binary .jdxr recording next to the text log.
+        self.actRecord = self.findChild(QtWidgets.QAction, "actionRecord_Binary")
+        self.recorder = None
+        # identity and output data rate of the connected sensor from its ;000,q,q reply, None until it answers.
+        self.identity = None
+        self.odr = None
+
+        self.actHistory = self.findChild(QtWidgets.QAction, "actionPlot_History")
+        self.actHistory.triggered.connect(self.set_history_length)
+
         ############################################################################
 
         # BUTTONS
@@ -106,6 +125,10 @@ class JDx_Display_Window(QtWidgets.QMainWindow):
         date_time = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
         filepath = os.path.join(os.path.expanduser("~"), f"JDx_log_{date_time}.txt")
         self.log_filepath_le.setText(filepath)
+        self.log_writer = JDx_Log_Writer(filepath, background=True, precision=SAMPLE_PRECISION)
+        self.log_filepath_le.editingFinished.connect(
+            lambda: self.log_writer.set_path(self.log_filepath_le.text())
+        )
 
         ############################################################################
 
@@ -143,37 +166,48 @@ class JDx_Display_Window(QtWidgets.QMainWindow):
         self.plot.addLegend()
         self.plot.showGrid(x=True, y=True)
         self.plot.setYRange(angle_limit_low, angle_limit_high)
-        # seed the plot data prior to starting.
-        self.time = list(range(10))
-        self.angle_x = [0 for _ in range(10)]
-        self.angle_y = [0 for _ in range(10)]
+        # plot history: rows are time, x angle and y angle. sized from the history length and the sample rate.
+        self.history_seconds = HISTORY_SECONDS
+        self.sample_rate = 1 / POLL_INTERVAL
+        self.history = Ring_Buffer(self.history_capacity(), HISTORY_COLUMNS)
+        self.sample_count = 0
 
         pen_x = pyqtgraph.mkPen(color=(255, 0, 255))
         pen_y = pyqtgraph.mkPen(color=(0, 255, 0))
 
         # Get a line reference
-        self.line_x = self.plot.plot(
-            self.time,
-            self.angle_x,
-            name="X Data",
-            pen=pen_x,
-            symbol="+",
-            symbolSize=5,
-            symbolBrush="b",
+        time_, angle_x, angle_y = self.history.view()
+        # the lines are drawn decimated to the plot width, the full history stays in self.history.
+        self.line_x = Decimating_Curve(
+            self.plot.plot(
+                time_,
+                angle_x,
+                name="X Data",
+                pen=pen_x,
+                symbol="+",
+                symbolSize=5,
+                symbolBrush="b",
+            )
         )
-        self.line_y = self.plot.plot(
-            self.time,
-            self.angle_y,
-            name="Y Data",
-            pen=pen_y,
-            symbol="+",
-            symbolSize=5,
-            symbolBrush="r",
+        self.line_y = Decimating_Curve(
+            self.plot.plot(
+                time_,
+                angle_y,
+                name="Y Data",
+                pen=pen_y,
+                symbol="+",
+                symbolSize=5,
+                symbolBrush="r",
+            )
         )
 
+        # the timer only redraws, samples are read by the acquisition worker.
         self.timer = QtCore.QTimer(self)
-        self.timer.setInterval(100)
+        self.timer.setInterval(33)
         self.timer.timeout.connect(self.update_plot)
+        self.worker = None
+        # the sensor was still streaming when the port was handed back, drain it before the next command.
+        self.resync_needed = False
 
         self.connected_to_sensor = False
 
@@ -181,9 +215,8 @@ class JDx_Display_Window(QtWidgets.QMainWindow):
 
     def save_messages(self):
         data = self.message_te.toPlainText()
-        with open(self.log_filepath_le.text(), "a") as file:
-            date_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            file.write(f"{date_time} - {data}")
+        self.log_writer.write(data)
+        self.log_writer.flush()
         return
 
     def about_page(self):
@@ -191,40 +224,129 @@ class JDx_Display_Window(QtWidgets.QMainWindow):
         self.about.show()
 
     def update_plot(self):
-
-        send_serial_data(self.sensor, ";000,v,v\r\n")
-        data = read_serial_data(self.sensor).replace("+", "")
-        with open(self.log_filepath_le.text(), "a") as file:
-            date_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            file.write(f"{date_time} - {data}")
-
-        data = data.split(",")
-
-        try:
-            x_data = float(data[3])
-            y_data = float(data[4])
-            temp = float(data[5])
-            addr = data[0]
-        except Exception as e:
-            self.message_te.append(e)
-            x_data = 0
-            y_data = 0
-            temp = 0
-            addr = 0
-
-        self.x_output_le.setText(f"{x_data:.4f}")
-        self.y_output_le.setText(f"{y_data:.4f}")
-        self.t_output_le.setText(f"{temp:.4f}")
-        self.address_le.setText(f"{addr}")
-
-        self.time = self.time[1:]
-        self.time.append(self.time[-1] + 1)
-        self.angle_x = self.angle_x[1:]
-        self.angle_x.append(x_data)
-        self.angle_y = self.angle_y[1:]
-        self.angle_y.append(y_data)
-        self.line_x.setData(self.time, self.angle_x)
-        self.line_y.setData(self.time, self.angle_y)
+        """drain the samples read by the acquisition worker, log them and redraw."""
+
+        for error in self.worker.take_errors():
+            self.message_te.append(error)
+        error = self.log_writer.take_error()
+        if error is not None:
+            self.message_te.append(f"Could not write the log: {error}")
+
+        samples = self.worker.take_samples()
+        if not samples:
+            return
+
+        # each sample is stamped with the time it was read from the port, not the time this timer tick drained it.
+        wall_times = [self.worker.wall_time(sample.time) for sample in samples]
+        self.log_writer.write_stamped((sample.frame for sample in samples), wall_times)
+        if self.recorder is not None:
+            self.recorder.append_samples(samples, wall_times)
+
+        sample = samples[-1]
+        self.x_output_le.setText(f"{sample.x:.4f}")
+        self.y_output_le.setText(f"{sample.y:.4f}")
+        self.t_output_le.setText(f"{sample.temperature:.4f}")
+        self.address_le.setText(f"{sample.address}")
+
+        n = len(samples)
+        self.history.extend(
+            (
+                [s.time - self.acquisition_started for s in samples],
+                [s.x for s in samples],
+                [s.y for s in samples],
+            )
+        )
+        self.sample_count += n
+        self.fit_history_to_rate()
+
+        time_, angle_x, angle_y = self.history.view()
+        self.show_rate(time_[-RATE_WINDOW:])
+        self.line_x.set_data(time_, angle_x, appended=True)
+        self.line_y.set_data(time_, angle_y, appended=True)
+
+    def show_rate(self, times) -> None:
+        """show the effective sample rate and the jitter between reads in the status bar, with the poll round trip
+        statistics in poll mode.
+
+        Args:
+            times (numpy.ndarray): receipt times of the latest samples, seconds.
+        """
+        rate, jitter = interval_statistics(times)
+        message = f"{rate:.1f} samples/s, read jitter {1000 * jitter:.2f} ms"
+        if self.worker.mode == POLL_MODE:
+            command = command_name(POLL_COMMAND)
+            histogram = self.sensor.latency.histograms.get(command)
+            if histogram is not None:
+                message = f"{message} | {command}: {histogram.summary()}"
+        self.statusbar.showMessage(message)
+
+    def show_latency(self, command: str) -> None:
+        """show the round trip statistics of a command type in the status bar.
+
+        Args:
+            command (str): command type, such as "q,q".
+        """
+        histogram = self.sensor.latency.histograms.get(command)
+        if histogram is not None:
+            self.statusbar.showMessage(f"{command}: {histogram.summary()}")
+
+    def export_latency(self):
+        """
+        save the round trip histograms of every command sent to the sensor to a JSON file next to the log.
+        """
+        if self.connected_to_sensor is not True:
+            self.message_te.append("Not connected to the sensor.")
+            return
+        path = os.path.splitext(self.log_writer.path)[0] + "_latency.json"
+        self.sensor.latency.export(path)
+        self.message_te.append(self.sensor.latency.summary())
+        self.message_te.append(f"Exported latency histograms to {path}")
+
+    def history_capacity(self) -> int:
+        """number of samples needed to hold the plot history at the current sample rate.
+
+        Returns:
+            int: ring buffer capacity, at most what fits in HISTORY_MEMORY.
+        """
+        capacity = max(2, int(self.history_seconds * self.sample_rate))
+        return min(capacity, capacity_for(HISTORY_MEMORY, HISTORY_COLUMNS))
+
+    def report_history_limit(self) -> None:
+        """tell the user when the plot history is cut short by HISTORY_MEMORY at the current sample rate."""
+        seconds = self.history_capacity() / self.sample_rate
+        if seconds < self.history_seconds:
+            self.message_te.append(
+                f"At {self.sample_rate:.0f} samples/s the plot keeps the last {seconds / 60:.0f} minutes, "
+                "every sample still goes to the log."
+            )
+
+    def fit_history_to_rate(self) -> None:
+        """once a second of stream is in, resize the plot history for the rate the sensor actually streams at."""
+        if self.worker.mode != STREAM_MODE:
+            return
+        elapsed = time.monotonic() - self.acquisition_started
+        if elapsed < 1:
+            return
+        self.sample_rate = self.sample_count / elapsed
+        capacity = self.history_capacity()
+        if abs(capacity - self.history.capacity) > 0.25 * self.history.capacity:
+            self.history.resize(capacity)
+
+    def set_history_length(self):
+        """ask the user for the length of the plot history in seconds."""
+        seconds, ok = QtWidgets.QInputDialog.getDouble(
+            self,
+            "Plot History",
+            "History length (sec):",
+            self.history_seconds,
+            1,
+            24 * 3600,
+            1,
+        )
+        if ok:
+            self.history_seconds = seconds
+            self.history.resize(self.history_capacity())
+            self.report_history_limit()
 
     def connect_to_sensor(self):
 
@@ -236,6 +358,41 @@ class JDx_Display_Window(QtWidgets.QMainWindow):
 
         self.message_te.append("Connected!")
         self.connected_to_sensor = True
+        self.identify_sensor()
+
+    def identify_sensor(self) -> None:
+        """ask the sensor for its identity with ;000,q,q, so recordings can name the serial number, and for the
+        rate it streams at, so the plot history is sized for it from the first sample."""
+        reply = query_serial_data(self.sensor, LINK_CHECK_COMMAND)
+        self.odr = reply_odr(reply)
+        try:
+            self.identity = sensor_identity(reply)
+        except ValueError as e:
+            self.identity = None
+            self.message_te.append(str(e))
+            return
+        self.message_te.append(f"{self.identity.model} serial {self.identity.serial_no}")
+
+    def stream_stopping(self) -> bool:
+        """
+        check whether a stopped stream still owns the serial port, or the sensor is still streaming, and tell the user.
+        """
+        if self.worker is not None:
+            if self.worker.is_alive():
+                self.message_te.append("The data stream is still stopping, please try again in a moment.")
+                return True
+            for error in self.worker.take_errors():
+                self.message_te.append(error)
+            if self.worker.resync_needed:
+                self.worker.resync_needed = False
+                self.resync_needed = True
+        if self.resync_needed:
+            self.sensor.write(STREAM_OFF_COMMAND)
+            if not discard_input(self.sensor, max_time=CANCEL_DRAIN_TIME):
+                self.message_te.append("The sensor is still streaming, please try again in a moment.")
+                return True
+            self.resync_needed = False
+        return False
 
     def send_command(self):
         if self.connected_to_sensor is True:
@@ -243,11 +400,12 @@ class JDx_Display_Window(QtWidgets.QMainWindow):
                 self.message_te.append(
                     "Cannot send command while app is streaming data. Please turn streaming off before sending commands."
                 )
-            else:
+            elif not self.stream_stopping():
                 data = self.command_le.text()
-                send_serial_data(self.sensor, f"{data}\r\n")
-                data = read_serial_data(self.sensor)
+                command = f"{data}\r\n"
+                data = query_serial_data(self.sensor, command)
                 self.message_te.append(data)
+                self.show_latency(command_name(command))
         else:
             self.message_te.append("Not connected to the sensor.")
 
@@ -256,19 +414,69 @@ class JDx_Display_Window(QtWidgets.QMainWindow):
             if self.STREAM_DATA is True:
                 self.message_te.append("Turning off data stream")
                 self.STREAM_DATA = False
+                self.worker.stop(STOP_TIMEOUT)
                 self.timer.stop()
-            else:
+                self.update_plot()
+                self.log_writer.flush()
+                if self.recorder is not None:
+                    self.recorder.close()
+                    self.recorder = None
+                self.actStreamMode.setEnabled(True)
+                self.actRecord.setEnabled(True)
+                if self.worker.stats.bad_frames:
+                    self.message_te.append(
+                        f"Skipped {self.worker.stats.bad_frames} frames that were not samples."
+                    )
+                if self.worker.is_alive():
+                    self.message_te.append("The data stream is still stopping, commands wait until it has.")
+            elif not self.stream_stopping():
                 self.STREAM_DATA = True
                 self.message_te.append("Turning on data stream")
+                self.actStreamMode.setEnabled(False)
+                self.actRecord.setEnabled(False)
                 self.message_te.append(
                     f"Logging data stream to {self.log_filepath_le.text()}"
                 )
+                mode = STREAM_MODE if self.actStreamMode.isChecked() else POLL_MODE
+                if self.actRecord.isChecked():
+                    recording = recording_path_for(self.log_filepath_le.text())
+                    self.recorder = JDx_Recorder(
+                        recording,
+                        serial_no=self.identity.serial_no if self.identity else "",
+                        settings={
+                            "port": self.port_cb.currentText(),
+                            "baud": self.baud_cb.currentText(),
+                            "parity": self.parity_cb.currentText(),
+                            "mode": mode,
+                        },
+                    )
+                    self.message_te.append(f"Recording data stream to {recording}")
+                self.worker = JDx_Acquisition_Worker(self.sensor, mode=mode)
+                self.acquisition_started = time.monotonic()
+                self.sample_count = 0
+                self.history.clear()
+                if mode == POLL_MODE:
+                    self.sample_rate = 1 / POLL_INTERVAL
+                else:
+                    # fit_history_to_rate trims the history once the real rate is known.
+                    self.sample_rate = self.odr or STREAM_RATE_GUESS
+                self.history.resize(self.history_capacity())
+                self.report_history_limit()
+                self.worker.start()
                 self.timer.start()
 
         else:
             self.message_te.append("Not connected to the sensor.")
         return
 
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.stop(STOP_TIMEOUT)
+        self.log_writer.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        super(JDx_Display_Window, self).closeEvent(event)
+
     def exit(self):
         self.close()
         return
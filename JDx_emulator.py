@@ -0,0 +1,325 @@
+import argparse
+import math
+import os
+import random
+import select
+import socket
+import threading
+import time
+
+from JDx_lut import AXES, TEMP_INDICES
+
+
+EMULATOR_ADDRESS = "057"
+EMULATOR_ODR = 100.0  # streamed frames per second
+CAL_TEMPS = (-40.0, 25.0, 85.0)
+COUNTS_PER_DEGREE = 3300.0  # rough ADC counts per arc-deg, so the tables cover about +/-300000 counts
+READ_SIZE = 4096
+
+
+class JDx_Emulator:
+    """software JDx that answers the commands the apps use.
+
+    It answers ;000,q,q, q,gf, q,be, q,bl, q,b, q,ma0 to q,ma2, q,mb, v,v and the ;000,? LUT dump in the formats the
+    apps parse, and streams frames at odr after ;000,s,1 until ;000,s,0. The tilt it reports drifts slowly, with
+    optional Gaussian noise, reply delay and a share of corrupted frames to exercise the error paths.
+    """
+
+    def __init__(
+        self,
+        serial_no: str = "EMU00001",
+        odr: float = EMULATOR_ODR,
+        noise: float = 0.0,
+        delay: float = 0.0,
+        corrupt_rate: float = 0.0,
+        lut_points: int = 64,
+        seed: int = None,
+    ):
+        """
+        Args:
+            serial_no (str, optional): serial number reported by ;000,q,q. Defaults to "EMU00001".
+            odr (float, optional): streamed frames per second. Defaults to EMULATOR_ODR.
+            noise (float, optional): standard deviation of the angle noise, arc-deg. Defaults to 0.0.
+            delay (float, optional): seconds before each reply. Defaults to 0.0.
+            corrupt_rate (float, optional): share of sample frames that are corrupted, 0 to 1. Defaults to 0.0.
+            lut_points (int, optional): points in each LUT table. Defaults to 64.
+            seed (int, optional): random seed, for repeatable noise and corruption. Defaults to None.
+        """
+        self.serial_no = serial_no
+        self.odr = odr
+        self.noise = noise
+        self.delay = delay
+        self.corrupt_rate = corrupt_rate
+        self.lut_points = lut_points
+        self.random = random.Random(seed)
+        self.streaming = False
+        self.started = time.monotonic()
+        self._stream_start = 0.0
+        self._stream_sent = 0
+        self._input = b""
+
+    def settings_replies(self) -> dict:
+        """reply of each settings query, keyed by the echoed command fields.
+
+        Returns:
+            dict: ("q", command) to reply, without the terminator.
+        """
+        a = EMULATOR_ADDRESS
+        return {
+            ("q", "q"): (
+                f";{a},q,q,JEWELL,JDI-100,{self.serial_no},FW 2.1.0,HW=C,BOOT=1,CAL=2024-03-01,MFG=2024-02-15,"
+                f"ADDR={a},BAUD=19200,PAR=E,STREAM={int(self.streaming)},TEST=0,UNITS=deg,RELOFF=0.000,"
+                f"TGAIN=1.000,TOFF=0.000,ODR={self.odr:g},DEC=1"
+            ),
+            ("q", "gf"): f";{a},q,gf,G: 9.80665",
+            ("q", "be"): f";{a},q,be,MAF,on",
+            ("q", "bl"): f";{a},q,bl,16",
+            ("q", "b"): f";{a},q,b,bandwidth,Hz,10",
+            ("q", "ma0"): f";{a},q,ma0,Column 0: 1.000120, 0.000310, -0.000050",
+            ("q", "ma1"): f";{a},q,ma1,Column 1: -0.000290, 0.999870, 0.000020",
+            ("q", "ma2"): f";{a},q,ma2,Column 2: 0.000000, 0.000000, 1.000000",
+            ("q", "mb"): f";{a},q,mb,Offsets: 0.012000, -0.008000, 0.000000",
+        }
+
+    def lut_lines(self) -> list:
+        """the ;000,? dump: temperature headers, one table per axis and calibration temp, and the end line.
+
+        Returns:
+            list: lines without terminators.
+        """
+        a = EMULATOR_ADDRESS
+        temps = ",".join(f"{temp:.1f}" for temp in CAL_TEMPS)
+        lines = [f";{a},{axis} Axis Temperatures: {temps}" for axis in AXES]
+        for axis in AXES:
+            for temp_index in TEMP_INDICES:
+                # counts drift and scale a little with temperature, with a slight non-linearity.
+                offset = 150.0 * (CAL_TEMPS[temp_index] - 25.0)
+                gain = COUNTS_PER_DEGREE * (1.0 + 0.0004 * (CAL_TEMPS[temp_index] - 25.0))
+                for point in range(self.lut_points):
+                    angle = -90.0 + 180.0 * point / (self.lut_points - 1)
+                    counts = gain * angle + 2.0e-3 * angle ** 3 + offset
+                    lines.append(f";{a},{axis},{temp_index},{point},{counts:+.0f},{angle:+.4f}")
+        lines.append(f";{a},?,success,end of LUT")
+        return lines
+
+    def sample_frame(self, elapsed: float) -> str:
+        """one output frame, ";addr,v,v,x,y,t".
+
+        Args:
+            elapsed (float): seconds since the emulator started, sets the slow tilt drift.
+
+        Returns:
+            str: the frame, corrupted at corrupt_rate.
+        """
+        x = 5.0 * math.sin(elapsed / 7.0) + self.random.gauss(0.0, self.noise)
+        y = 3.0 * math.cos(elapsed / 11.0) + self.random.gauss(0.0, self.noise)
+        temperature = 25.0 + 0.5 * math.sin(elapsed / 60.0)
+        frame = f";{EMULATOR_ADDRESS},v,v,{x:+.4f},{y:+.4f},{temperature:+.2f}"
+        if self.corrupt_rate and self.random.random() < self.corrupt_rate:
+            cut = self.random.randrange(1, len(frame))
+            frame = frame[:cut] + "#" + frame[cut + 1 :]
+        return frame
+
+    def respond(self, command: str) -> list:
+        """answer one command.
+
+        Args:
+            command (str): command without its terminator.
+
+        Returns:
+            list: reply lines without terminators, empty for commands with no reply.
+        """
+        fields = [field.strip() for field in command.split(",")]
+        key = tuple(fields[1:3])
+        a = EMULATOR_ADDRESS
+
+        if key == ("s", "1"):
+            self.streaming = True
+            self._stream_start = time.monotonic()
+            self._stream_sent = 0
+            return []
+        if key == ("s", "0"):
+            self.streaming = False
+            return []
+        if key == ("v", "v"):
+            return [self.sample_frame(time.monotonic() - self.started)]
+        if fields[1:2] == ["?"]:
+            return self.lut_lines()
+        if key[:1] == ("w",):
+            return []  # writes, baud changes included, are accepted and ignored.
+        replies = self.settings_replies()
+        if key in replies:
+            return [replies[key]]
+        return [f";{a},{','.join(fields[1:])},error,unknown command"]
+
+    def receive(self, data: bytes) -> bytes:
+        """feed bytes from the host and collect the replies to every complete command.
+
+        Args:
+            data (bytes): bytes written by the host.
+
+        Returns:
+            bytes: replies, each line terminated with "\\r\\n".
+        """
+        self._input += data
+        *commands, self._input = self._input.split(b"\r\n")
+        lines = []
+        for command in commands:
+            command = command.decode("ascii", errors="replace").strip()
+            if command:
+                lines.extend(self.respond(command))
+        if lines and self.delay:
+            time.sleep(self.delay)
+        return "".join(f"{line}\r\n" for line in lines).encode()
+
+    def due_frames(self) -> bytes:
+        """streamed frames that are due since the last call.
+
+        Returns:
+            bytes: frames, each terminated with "\\r\\n". Empty when not streaming.
+        """
+        if not self.streaming:
+            return b""
+        now = time.monotonic()
+        due = int((now - self._stream_start) * self.odr) - self._stream_sent
+        if due <= 0:
+            return b""
+        self._stream_sent += due
+        step = 1.0 / self.odr
+        start = now - self.started - due * step
+        return "".join(
+            f"{self.sample_frame(start + i * step)}\r\n" for i in range(1, due + 1)
+        ).encode()
+
+    def serve(self, read, write, fileno: int, stop: threading.Event) -> None:
+        """answer a host over one byte channel until stop is set or the channel closes.
+
+        Args:
+            read (callable): read(size) -> bytes, b"" when the channel closed.
+            write (callable): write(bytes).
+            fileno (int): descriptor to wait on.
+            stop (threading.Event): set to stop serving.
+        """
+        period = min(0.05, 1.0 / self.odr)
+        while not stop.is_set():
+            readable, _, _ = select.select([fileno], [], [], period)
+            try:
+                if readable:
+                    data = read(READ_SIZE)
+                    if not data:
+                        return
+                    reply = self.receive(data)
+                    if reply:
+                        write(reply)
+                frames = self.due_frames()
+                if frames:
+                    write(frames)
+            except OSError:
+                return
+
+
+def open_pty(emulator: JDx_Emulator) -> tuple:
+    """serve an emulator on a pseudo terminal, which the apps open like a serial port. Unix only.
+
+    Args:
+        emulator (JDx_Emulator): emulator to serve.
+
+    Returns:
+        tuple: (device path, stop event). Set the event to stop the emulator.
+    """
+    import tty
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+    stop = threading.Event()
+
+    def run():
+        # the slave side stays open here, so the master does not see a hang up between host connections.
+        emulator.serve(
+            lambda size: os.read(master, size),
+            lambda data: os.write(master, data),
+            master,
+            stop,
+        )
+
+    threading.Thread(target=run, daemon=True).start()
+    return path, stop
+
+
+def open_socket(emulator: JDx_Emulator, host: str = "127.0.0.1", port: int = 0) -> tuple:
+    """serve an emulator on a TCP port, which the apps open as a pyserial socket:// URL. Hosts are served one at a
+    time, a new connection is accepted when the previous one closes.
+
+    Args:
+        emulator (JDx_Emulator): emulator to serve.
+        host (str, optional): interface to listen on. Defaults to "127.0.0.1".
+        port (int, optional): TCP port. Defaults to 0, any free port.
+
+    Returns:
+        tuple: (URL, stop event). Set the event to stop the emulator.
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(1)
+    server.settimeout(0.2)
+    url = f"socket://{host}:{server.getsockname()[1]}"
+    stop = threading.Event()
+
+    def run():
+        with server:
+            while not stop.is_set():
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    continue
+                with connection:
+                    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    emulator.streaming = False
+                    emulator.serve(connection.recv, connection.sendall, connection.fileno(), stop)
+
+    threading.Thread(target=run, daemon=True).start()
+    return url, stop
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Emulate a JDx on a pseudo terminal or a socket:// URL, for testing without hardware."
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="HOST:PORT",
+        help="serve on a TCP port instead of a pseudo terminal, for example 127.0.0.1:5057",
+    )
+    parser.add_argument("--odr", type=float, default=EMULATOR_ODR, help="streamed frames per second")
+    parser.add_argument("--noise", type=float, default=0.001, help="angle noise, arc-deg")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each reply")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="share of corrupted sample frames, 0 to 1")
+    parser.add_argument("--lut-points", type=int, default=64, help="points per LUT table")
+    parser.add_argument("--serial", default="EMU00001", help="serial number to report")
+    args = parser.parse_args()
+
+    emulator = JDx_Emulator(
+        serial_no=args.serial,
+        odr=args.odr,
+        noise=args.noise,
+        delay=args.delay,
+        corrupt_rate=args.corrupt,
+        lut_points=args.lut_points,
+    )
+    if args.socket:
+        host, _, port = args.socket.rpartition(":")
+        address, stop = open_socket(emulator, host or "127.0.0.1", int(port))
+    else:
+        address, stop = open_pty(emulator)
+    print(f"JDx emulator on {address}, press CTRL+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+if __name__ == "__main__":
+    main()
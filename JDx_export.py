@@ -0,0 +1,253 @@
+import argparse
+import concurrent.futures
+import fnmatch
+import json
+import os
+
+import numpy
+import pyqtgraph
+import pyqtgraph.exporters
+
+from JDx_lut import (
+    AXES,
+    LUT_DTYPE,
+    TEMP_INDICES,
+    compute_deviations,
+    deviation_curve,
+    lut_curve,
+    parse_lut,
+    read_lut_log,
+)
+
+
+PLOT_SIZE = (1600, 1000)  # pixels of the exported images
+# same colors as the JDx_configuration plots.
+CURVE_COLORS = {
+    ("X", 0): (29, 212, 8),
+    ("Y", 0): (207, 203, 4),
+    ("X", 1): (237, 79, 74),
+    ("Y", 1): (54, 235, 232),
+    ("X", 2): (240, 113, 238),
+    ("Y", 2): (108, 101, 240),
+}
+FLEET_LUT_FILE = "lut.txt"  # raw dump in each JDx_fleet sensor directory
+LOG_PATTERN = "JDx_log_*.txt"  # logs written by JDx_configuration
+
+
+def plot_paths(directory: str, name: str, reference_temp_index: int = 1) -> tuple:
+    """image files of one sensor, as both this tool and JDx_configuration name them.
+
+    The deviation plot name also holds the reference temp, so plots against another reference are not taken for up
+    to date.
+
+    Args:
+        directory (str): output directory.
+        name (str): sensor name, usually the serial number.
+        reference_temp_index (int, optional): table the deviations are computed against. Defaults to 1.
+
+    Returns:
+        tuple: (LUT plot path, deviation plot path).
+    """
+    return (
+        os.path.join(directory, f"{name}_LUT_plot.png"),
+        os.path.join(directory, f"{name}_Deviations_Temp_{reference_temp_index + 1}_plot.png"),
+    )
+
+
+def find_sources(paths) -> list:
+    """stored LUTs under the given paths.
+
+    A source is a JDx_fleet sensor directory (holding lut.txt), a LUT cache entry (.npz) or a JDx_configuration log.
+    Directories are searched recursively, files are taken as they are.
+
+    Args:
+        paths (iterable): files and directories.
+
+    Returns:
+        list: source paths, sorted.
+    """
+    sources = set()
+    for path in paths:
+        if not os.path.isdir(path):
+            sources.add(path)
+            continue
+        for root, _, files in os.walk(path):
+            if FLEET_LUT_FILE in files:
+                sources.add(root)
+            for name in files:
+                if name.endswith(".npz") or fnmatch.fnmatch(name, LOG_PATTERN):
+                    sources.add(os.path.join(root, name))
+    return sorted(sources)
+
+
+def source_time(source: str) -> float:
+    """modification time of the LUT data of a source.
+
+    Args:
+        source (str): source path.
+
+    Returns:
+        float: modification time, unix seconds.
+    """
+    if os.path.isdir(source):
+        return os.path.getmtime(os.path.join(source, FLEET_LUT_FILE))
+    return os.path.getmtime(source)
+
+
+def load_source(source: str) -> tuple:
+    """read the LUT stored in a source.
+
+    Args:
+        source (str): JDx_fleet sensor directory, LUT cache entry or JDx_configuration log.
+
+    Returns:
+        tuple: (name, LUT array, cal temps dict). The name is the serial number when the source records it.
+    """
+    if os.path.isdir(source):
+        with open(os.path.join(source, FLEET_LUT_FILE)) as file:
+            lut, cal_temps = parse_lut(file)
+        return os.path.basename(os.path.normpath(source)), lut, cal_temps
+    if source.endswith(".npz"):
+        with numpy.load(source) as entry:
+            meta = json.loads(str(entry["meta"]))
+            lut = entry["lut"].astype(LUT_DTYPE)
+        return meta["identity"][1], lut, meta["cal_temps"]
+    lut, cal_temps = read_lut_log(source)
+    return os.path.splitext(os.path.basename(source))[0], lut, cal_temps
+
+
+def render_plots(lut: numpy.ndarray, lut_path: str, deviation_path: str, reference_temp_index: int = 1) -> None:
+    """draw the LUT and deviation plots of a LUT into image files, without showing a window.
+
+    Needs a QApplication in the calling process and must run on its thread, see start_renderer.
+
+    Args:
+        lut (numpy.ndarray): parsed LUT.
+        lut_path (str): LUT plot image file.
+        deviation_path (str): deviation plot image file.
+        reference_temp_index (int, optional): table the deviations are computed against. Defaults to 1.
+    """
+    deviations = compute_deviations(lut, reference_temp_index)
+    styles = {"color": "white", "font-size": "18px"}
+    plots = (
+        ("Angle vs ADC Counts", "Angle (arc-deg)", "Data", lut_path),
+        ("Deviation from Nominal vs ADC Counts", "Deviation (counts) (x1000)", "Deviation", deviation_path),
+    )
+    for title, left_label, curve_name, path in plots:
+        plot = pyqtgraph.PlotWidget()
+        plot.resize(*PLOT_SIZE)
+        plot.show()  # lays the plot out at its size, nothing is displayed on the offscreen platform.
+        plot.setTitle(title, color="w", size="18pt")
+        plot.setLabel("left", left_label, **styles)
+        plot.setLabel("bottom", "ADC Counts (x1000)", **styles)
+        plot.showGrid(x=True, y=True)
+        if path == lut_path:
+            plot.addLegend()
+        for temp_index in TEMP_INDICES:
+            for axis in AXES:
+                if path == lut_path:
+                    curve = lut_curve(lut, axis, temp_index)
+                else:
+                    curve = deviation_curve(deviations, axis, temp_index)
+                plot.plot(
+                    *curve,
+                    name=f"{axis} {curve_name} Temp {temp_index + 1}",
+                    pen=pyqtgraph.mkPen(color=CURVE_COLORS[(axis, temp_index)]),
+                    symbol="+",
+                    symbolSize=5,
+                    symbolBrush="b",
+                )
+        exporter = pyqtgraph.exporters.ImageExporter(plot.plotItem)
+        exporter.export(path)
+        plot.deleteLater()
+
+
+def start_renderer() -> None:
+    """set up a process for render_plots: an offscreen Qt platform, so no display is needed, and a QApplication."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    pyqtgraph.mkQApp()
+
+
+def export_source(source: str, directory: str, reference_temp_index: int = 1, force: bool = False) -> tuple:
+    """export the plots of one source unless they are newer than its LUT data.
+
+    Args:
+        source (str): source path.
+        directory (str): output directory.
+        reference_temp_index (int, optional): table the deviations are computed against. Defaults to 1.
+        force (bool, optional): export even when the images are up to date. Defaults to False.
+
+    Returns:
+        tuple: (source, status), status is "exported", "up to date" or the reason it failed.
+    """
+    try:
+        name, lut, _ = load_source(source)
+        if len(lut) == 0:
+            return source, "no LUT"
+        paths = plot_paths(directory, name, reference_temp_index)
+        changed = source_time(source)
+        if not force and all(os.path.exists(path) and os.path.getmtime(path) >= changed for path in paths):
+            return source, "up to date"
+        render_plots(lut, *paths, reference_temp_index=reference_temp_index)
+        return source, "exported"
+    except Exception as e:
+        return source, str(e) or type(e).__name__
+
+
+def export_all(sources: list, directory: str, reference_temp_index: int = 1, force: bool = False, workers: int = None):
+    """export the plots of many sources on a pool of offscreen rendering processes.
+
+    Qt only renders on the main thread of a process, so the pool is made of processes rather than threads.
+
+    Args:
+        sources (list): source paths, see find_sources.
+        directory (str): output directory, created when missing.
+        reference_temp_index (int, optional): table the deviations are computed against. Defaults to 1.
+        force (bool, optional): export even when the images are up to date. Defaults to False.
+        workers (int, optional): rendering processes. Defaults to the number of CPUs.
+
+    Yields:
+        tuple: (source, status) of each source, as they finish.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=start_renderer) as executor:
+        futures = [
+            executor.submit(export_source, source, directory, reference_temp_index, force) for source in sources
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export LUT and deviation plots of stored LUTs without opening a window."
+    )
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="JDx_fleet output, LUT cache entries (.npz) or JDx_configuration logs, directories are searched",
+    )
+    parser.add_argument("--output", default=".", help="directory the images are written to")
+    parser.add_argument(
+        "--reference",
+        type=int,
+        default=2,
+        choices=(1, 2, 3),
+        help="calibration temp the deviations are computed against",
+    )
+    parser.add_argument("--workers", type=int, help="rendering processes")
+    parser.add_argument("--force", action="store_true", help="export images that are up to date too")
+    args = parser.parse_args()
+
+    sources = find_sources(args.paths)
+    counts = {}
+    for source, status in export_all(
+        sources, args.output, args.reference - 1, args.force, args.workers
+    ):
+        counts[status] = counts.get(status, 0) + 1
+        print(f"{source}: {status}")
+    print(", ".join(f"{count} {status}" for status, count in counts.items()) or "No LUTs found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import argparse
+import concurrent.futures
+import csv
+import datetime
+import os
+import time
+
+import numpy
+
+from JDx_acquisition import BAUD_COMMAND, FAST_BAUD_RATES, LUT_Download_Worker
+from JDx_lut import LUT_DTYPE, parse_lut
+from JDx_settings import SETTINGS_COMMANDS, parse_settings
+from JDx_stream import Detected_JDx, autodetect_jdx, open_serial_port
+from JDx_transport import query_batch
+
+
+SUMMARY_FILE = "summary.csv"
+SUMMARY_FIELDS = (
+    "port",
+    "baud",
+    "parity",
+    "model",
+    "serial_no",
+    "fw_version",
+    "mfg_date",
+    "lut_points",
+    "lut_baud",
+    "settings_s",
+    "lut_s",
+    "total_s",
+    "query_p95_ms",
+    "query_timeouts",
+    "status",
+)
+
+
+def sensor_directory(directory: str, serial_no: str, port: str) -> str:
+    """directory that holds the artifacts of one sensor.
+
+    Args:
+        directory (str): output directory of the run.
+        serial_no (str): serial number of the sensor.
+        port (str): port the sensor is on. It is part of the name, so sensors that report the same serial number
+            (unprogrammed parts) do not overwrite each other.
+
+    Returns:
+        str: path named after the serial number and the port.
+    """
+    name = f"{serial_no}_{os.path.basename(port)}"
+    return os.path.join(directory, "".join(c if c.isalnum() else "_" for c in name))
+
+
+def dump_sensor(sensor: Detected_JDx, directory: str, fast_baud_rates=None) -> dict:
+    """dump the settings and the LUT of one sensor and write them to its own directory.
+
+    The directory gets settings.json, lut.csv, lut.txt (the raw ;000,? dump) and latency.json (the round trip
+    histograms of the settings queries).
+
+    Args:
+        sensor (Detected_JDx): detected sensor, with its connection open.
+        directory (str): output directory of the run.
+        fast_baud_rates (iterable, optional): rates to try for the LUT dump, see LUT_Download_Worker. Defaults to
+            None, dump at the detected baud.
+
+    Returns:
+        dict: summary row, see SUMMARY_FIELDS.
+    """
+    row = dict.fromkeys(SUMMARY_FIELDS, "")
+    row.update(port=sensor.port, baud=sensor.baud, parity=sensor.parity)
+    started = time.monotonic()
+    try:
+        responses = query_batch(sensor.dev, SETTINGS_COMMANDS)
+        missing = [command for command in SETTINGS_COMMANDS if command not in responses]
+        if missing:
+            raise TimeoutError(f"No response to {', '.join(missing)}")
+        settings = parse_settings(responses)
+        row.update(settings.identity._asdict())
+        row["settings_s"] = f"{time.monotonic() - started:.2f}"
+
+        # the worker's own thread is not needed, run the download on this pool thread.
+        lut_started = time.monotonic()
+        worker = LUT_Download_Worker(sensor.dev, fast_baud_rates=fast_baud_rates)
+        worker.run()
+        lines = worker.take_lines()
+        errors = worker.take_errors()
+        lut, _ = parse_lut(lines)
+        row["lut_s"] = f"{time.monotonic() - lut_started:.2f}"
+        row["lut_points"] = len(lut)
+        row["lut_baud"] = worker.baud
+
+        path = sensor_directory(directory, settings.serial_no, sensor.port)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "settings.json"), "w") as file:
+            file.write(settings.to_json())
+        with open(os.path.join(path, "lut.txt"), "w") as file:
+            file.writelines(f"{line}\n" for line in lines)
+        sensor.dev.latency.export(os.path.join(path, "latency.json"))
+        numpy.savetxt(
+            os.path.join(path, "lut.csv"),
+            lut,
+            fmt=["%s", "%d", "%d", "%.0f", "%.6f"],
+            delimiter=",",
+            header=",".join(LUT_DTYPE.names),
+            comments="",
+        )
+
+        row["status"] = "; ".join(errors) if errors else "ok"
+        if not worker.completed and not errors:
+            row["status"] = "LUT incomplete"
+    except Exception as e:
+        row["status"] = str(e) or type(e).__name__
+    histograms = sensor.dev.latency.histograms.values()
+    if histograms:
+        row["query_p95_ms"] = f"{1000 * max(histogram.percentile(95) for histogram in histograms):.1f}"
+        row["query_timeouts"] = sum(histogram.timeouts for histogram in histograms)
+    row["total_s"] = f"{time.monotonic() - started:.2f}"
+    return row
+
+
+def dump_fleet(sensors: list, directory: str, fast_baud_rates=None, workers: int = None) -> list:
+    """dump every sensor in parallel, one pool thread per sensor, and write the summary table.
+
+    Args:
+        sensors (list): Detected_JDx of each sensor.
+        directory (str): output directory of the run, created when missing.
+        fast_baud_rates (iterable, optional): rates to try for the LUT dumps. Defaults to None.
+        workers (int, optional): most sensors dumped at once. Defaults to all of them.
+
+    Returns:
+        list: summary rows, in the order of the sensors.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if not sensors:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers or len(sensors)) as executor:
+        futures = [
+            executor.submit(dump_sensor, sensor, directory, fast_baud_rates) for sensor in sensors
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            row = future.result()
+            print(f"{row['port']}: {row['serial_no'] or '?'} {row['status']} in {row['total_s']} s")
+        rows = [future.result() for future in futures]
+
+    with open(os.path.join(directory, SUMMARY_FILE), "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Dump the settings and LUT of every connected JDx into one report."
+    )
+    parser.add_argument(
+        "--output",
+        default=datetime.datetime.now().strftime("JDx_fleet_%Y_%m_%d_%H_%M_%S"),
+        help="output directory, one subdirectory per sensor plus summary.csv",
+    )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="dump the LUTs at the fastest baud each sensor accepts, needs BAUD_COMMAND set in JDx_acquisition.py",
+    )
+    parser.add_argument("--workers", type=int, help="most sensors dumped at once")
+    parser.add_argument(
+        "--port", action="append", help="serial port or pyserial URL, repeat for several, skips autodetection"
+    )
+    parser.add_argument("--baud", type=int, default=19200, help="baud rate with --port")
+    parser.add_argument(
+        "--parity", default="E", choices=("E", "N", "O"), help="parity with --port"
+    )
+    args = parser.parse_args()
+    if args.fast and BAUD_COMMAND is None:
+        parser.error("--fast needs the sensor's baud change command in BAUD_COMMAND in JDx_acquisition.py")
+
+    if args.port:
+        sensors = []
+        for port in args.port:
+            dev = open_serial_port(port, args.baud, args.parity)
+            if dev is not None:
+                sensors.append(Detected_JDx(port, args.baud, args.parity, dev, ""))
+    else:
+        sensors = autodetect_jdx()
+    if not sensors:
+        print("No JDx found")
+        return
+
+    started = time.monotonic()
+    rows = dump_fleet(
+        sensors, args.output, FAST_BAUD_RATES if args.fast else None, args.workers
+    )
+    for sensor in sensors:
+        print(f"{sensor.port} round trips:\n{sensor.dev.latency.summary()}")
+        sensor.dev.close()
+
+    failed = sum(1 for row in rows if row["status"] != "ok")
+    print(
+        f"Dumped {len(rows)} sensors in {time.monotonic() - started:.1f} s, {failed} with problems. "
+        f"Summary in {os.path.join(args.output, SUMMARY_FILE)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
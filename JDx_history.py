@@ -0,0 +1,108 @@
+import numpy
+
+
+def capacity_for(memory: int, columns: int, dtype=numpy.float64) -> int:
+    """largest Ring_Buffer capacity whose storage fits in a memory budget.
+
+    Args:
+        memory (int): bytes the storage may take.
+        columns (int): values per sample.
+        dtype (optional): storage type. Defaults to numpy.float64.
+
+    Returns:
+        int: number of samples.
+    """
+    # every value is stored twice, see Ring_Buffer.
+    return memory // (2 * columns * numpy.dtype(dtype).itemsize)
+
+
+class Ring_Buffer:
+    """fixed-capacity history of samples with several columns (time, x, y, ...).
+
+    The storage is preallocated twice over and every value is written to both halves, so the most recent samples
+    are always one contiguous slice. view() hands that slice out without copying, and appending costs the same
+    whatever the capacity.
+    """
+
+    def __init__(self, capacity: int, columns: int, dtype=numpy.float64):
+        """allocate the buffer.
+
+        Args:
+            capacity (int): number of samples kept.
+            columns (int): values per sample.
+            dtype (optional): storage type. Defaults to numpy.float64.
+        """
+        if capacity < 1:
+            raise ValueError("Ring buffer capacity must be at least 1")
+        self.capacity = capacity
+        self.columns = columns
+        self._data = numpy.zeros((columns, 2 * capacity), dtype=dtype)
+        self._head = 0  # index of the next write, in [0, capacity)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def extend(self, values) -> None:
+        """append a batch of samples.
+
+        Args:
+            values (array-like): shape (columns, n), one row per column.
+        """
+        values = numpy.asarray(values, dtype=self._data.dtype)
+        n = values.shape[1]
+        if n == 0:
+            return
+        if n > self.capacity:
+            values = values[:, -self.capacity :]
+            n = self.capacity
+
+        capacity = self.capacity
+        first = min(n, capacity - self._head)
+        for offset in (0, capacity):
+            start = self._head + offset
+            self._data[:, start : start + first] = values[:, :first]
+        if first < n:
+            # wrapped around, the rest goes to the front of both halves.
+            rest = n - first
+            for offset in (0, capacity):
+                self._data[:, offset : offset + rest] = values[:, first:]
+
+        self._head = (self._head + n) % capacity
+        self._count = min(self._count + n, capacity)
+
+    def view(self) -> numpy.ndarray:
+        """the samples held, oldest first, without copying.
+
+        Returns:
+            numpy.ndarray: shape (columns, len(self)). Only valid until the next extend().
+        """
+        end = self._head + self.capacity
+        return self._data[:, end - self._count : end]
+
+    def last(self) -> numpy.ndarray:
+        """the most recent sample.
+
+        Returns:
+            numpy.ndarray: shape (columns,).
+        """
+        if self._count == 0:
+            raise IndexError("Ring buffer is empty")
+        return self._data[:, self._head + self.capacity - 1]
+
+    def resize(self, capacity: int) -> None:
+        """change the capacity, keeping the most recent samples that still fit.
+
+        Args:
+            capacity (int): new number of samples kept.
+        """
+        if capacity == self.capacity:
+            return
+        kept = self.view()[:, -capacity:].copy()
+        self.__init__(capacity, self.columns, self._data.dtype)
+        self.extend(kept)
+
+    def clear(self) -> None:
+        """drop every sample."""
+        self._head = 0
+        self._count = 0
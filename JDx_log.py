@@ -0,0 +1,238 @@
+import queue
+import threading
+import time
+
+
+FLUSH_LINES = 512
+FLUSH_INTERVAL = 1.0
+# seconds between checks that the writer thread is still alive while waiting on it.
+WRITER_POLL = 0.5
+# digits of the fraction of the second in the stamps of sample logs, microseconds.
+SAMPLE_PRECISION = 6
+
+
+class Timestamp_Formatter:
+    """format "%Y-%m-%d %H:%M:%S" log stamps, calling strftime at most once per second.
+
+    With a precision, the fraction of the second is appended (".123456" for 6), so records can be lined up against
+    other instruments.
+    """
+
+    def __init__(self, fmt: str = "%Y-%m-%d %H:%M:%S", precision: int = 0):
+        self.fmt = fmt
+        self.precision = precision
+        self._scale = 10 ** precision
+        self._second = None
+        self._text = ""
+
+    def format(self, timestamp: float = None) -> str:
+        """format a unix timestamp.
+
+        Args:
+            timestamp (float, optional): seconds since the epoch. Defaults to now.
+
+        Returns:
+            str: formatted local time.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        second = int(timestamp)
+        if second != self._second:
+            self._second = second
+            self._text = time.strftime(self.fmt, time.localtime(second))
+        if not self.precision:
+            return self._text
+        fraction = min(int((timestamp - second) * self._scale), self._scale - 1)
+        return f"{self._text}.{fraction:0{self.precision}d}"
+
+
+class JDx_Log_Writer:
+    """append "<datetime> - <line>" records to a log file through one open handle.
+
+    Lines are buffered and written out once FLUSH_LINES are pending or FLUSH_INTERVAL seconds have passed since the
+    last flush. With background=True the file I/O happens on a writer thread and write() only queues the lines.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_lines: int = FLUSH_LINES,
+        flush_interval: float = FLUSH_INTERVAL,
+        background: bool = False,
+        precision: int = 0,
+    ):
+        """set up the writer. The file is opened on the first flush.
+
+        Args:
+            path (str): log file, appended to.
+            flush_lines (int, optional): pending lines that trigger a flush. Defaults to FLUSH_LINES.
+            flush_interval (float, optional): seconds between time-triggered flushes. Defaults to FLUSH_INTERVAL.
+            background (bool, optional): write on a background thread. Defaults to False.
+            precision (int, optional): decimals of the seconds in the stamps. Defaults to 0.
+        """
+        self.path = path
+        self.flush_lines = flush_lines
+        self.flush_interval = flush_interval
+        self.timestamps = Timestamp_Formatter(precision=precision)
+        # last error hit by the background writer thread, if any.
+        self.error = None
+
+        self._file = None
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._queue = None
+        self._thread = None
+        if background:
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def set_path(self, path: str) -> None:
+        """switch to another log file, flushing everything written so far to the old one.
+
+        Args:
+            path (str): new log file.
+        """
+        if path == self.path:
+            return
+        self.flush()
+        with self._lock:
+            self._close_file()
+            self.path = path
+
+    def write(self, line: str, timestamp: float = None) -> None:
+        """log one line.
+
+        Args:
+            line (str): text to log, without a line terminator.
+            timestamp (float, optional): unix time of the record. Defaults to now.
+        """
+        self.write_lines((line,), timestamp)
+
+    def write_lines(self, lines, timestamp: float = None) -> None:
+        """log several lines stamped with the same time.
+
+        Args:
+            lines (iterable): text to log, without line terminators.
+            timestamp (float, optional): unix time of the records. Defaults to now.
+        """
+        date_time = self.timestamps.format(timestamp)
+        self._add([f"{date_time} - {line}\n" for line in lines])
+
+    def write_stamped(self, lines, timestamps) -> None:
+        """log several lines, each stamped with its own time.
+
+        Args:
+            lines (iterable): text to log, without line terminators.
+            timestamps (iterable): unix time of each line.
+        """
+        stamp = self.timestamps.format
+        self._add([f"{stamp(timestamp)} - {line}\n" for line, timestamp in zip(lines, timestamps)])
+
+    def _add(self, records: list) -> None:
+        """queue formatted records for writing."""
+        if self._queue is not None:
+            self._queue.put(records)
+            return
+
+        with self._lock:
+            self._pending.extend(records)
+            if self._flush_due():
+                self._flush_pending()
+
+    def flush(self) -> None:
+        """write every pending line to disk."""
+        if self._queue is not None:
+            done = threading.Event()
+            self._queue.put(done)
+            self._wait(done)
+            return
+
+        with self._lock:
+            self._flush_pending()
+
+    def take_error(self):
+        """the last error hit by the background writer thread, cleared so it is reported once.
+
+        Returns:
+            Exception: the error, None if there was none.
+        """
+        error, self.error = self.error, None
+        return error
+
+    def close(self) -> None:
+        """flush and close the log file, stopping the writer thread if there is one."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._wait(None)
+            self._thread = None
+            self._queue = None
+
+        with self._lock:
+            self._flush_pending()
+            self._close_file()
+
+    def _wait(self, done: threading.Event) -> None:
+        """wait for the writer thread to work through the queue up to an event, or to exit when there is none.
+
+        Returns early if the thread has died, so a caller on the GUI thread can never hang on it.
+
+        Args:
+            done (threading.Event): event queued after the records to wait for, None to wait for the thread to exit.
+        """
+        while self._thread.is_alive():
+            if done is None:
+                self._thread.join(WRITER_POLL)
+            elif done.wait(WRITER_POLL):
+                return
+
+    def _flush_due(self) -> bool:
+        return (
+            len(self._pending) >= self.flush_lines
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        )
+
+    def _flush_pending(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.writelines(self._pending)
+        self._file.flush()
+        self._pending = []
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _run(self) -> None:
+        """writer thread: collect queued records and flush them on the size/time thresholds."""
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = []
+
+            with self._lock:
+                try:
+                    if item is None:
+                        self._flush_pending()
+                        return
+                    if isinstance(item, threading.Event):
+                        self._flush_pending()
+                        continue
+                    self._pending.extend(item)
+                    if self._flush_due():
+                        self._flush_pending()
+                except Exception as e:
+                    # nobody to raise to on this thread, keep the error for the owner and drop the lines, so the
+                    # thread lives on to serve later flushes.
+                    self.error = e
+                    self._pending = []
+                finally:
+                    if isinstance(item, threading.Event):
+                        item.set()
@@ -0,0 +1,225 @@
+import numpy
+
+
+AXES = ("X", "Y")
+TEMP_INDICES = (0, 1, 2)
+COUNTS_SCALE = 0.001  # scaling for the ADC counts to a more friendly scale.
+
+# last line of the ;000,? dump.
+END_OF_LUT = ("057,?,success,end of LUT", "Z Axis")
+
+DEVIATION_DTYPE = numpy.dtype(
+    [
+        ("axis", "U1"),
+        ("temp_index", "u1"),
+        ("point", "u4"),
+        ("counts", "f8"),  # raw ADC counts of the point at its own temperature
+        ("deviation", "f8"),  # reference counts minus counts, for the same point
+    ]
+)
+
+LUT_DTYPE = numpy.dtype(
+    [
+        ("axis", "U1"),  # "X" or "Y"
+        ("temp_index", "u1"),  # calibration temperature, 0 to 2
+        ("point", "u4"),  # position of the point in its table
+        ("counts", "f8"),  # raw ADC counts
+        ("angle", "f8"),  # arc-deg
+    ]
+)
+
+
+def is_end_of_lut(line: str) -> bool:
+    """check for the line that ends the ;000,? dump.
+
+    Args:
+        line (str): line from the LUT output stream.
+
+    Returns:
+        bool: True at the end of the dump.
+    """
+    return any(marker in line for marker in END_OF_LUT)
+
+
+def parse_cal_temps(line: str) -> tuple:
+    """parse an "Axis Temperatures" header, which lists the temps at which an axis was calibrated.
+
+    Args:
+        line (str): line from the LUT output stream.
+
+    Returns:
+        tuple: (axis, [temp 1, temp 2, temp 3]) as strings, or None when the line is not a header.
+    """
+    if "Axis Temperatures" not in line:
+        return None
+    if "X Axis" in line:
+        axis = "X"
+    elif "Y Axis" in line:
+        axis = "Y"
+    else:
+        return None
+    data = line.split(",")
+    temps = [data[1].split(":")[1].replace(" ", ""), data[2].strip(), data[3].strip()]
+    return axis, temps
+
+
+def parse_lut(lines) -> tuple:
+    """convert a raw ;000,? dump into one structured array.
+
+    Data lines look like ";addr,axis,temp index,point,counts,angle". They are picked out and converted column by
+    column in one pass. A point's position in its table is its order in the dump.
+
+    Args:
+        lines (iterable): lines of the dump, with or without terminators. Anything after the end of LUT line is
+            ignored.
+
+    Returns:
+        tuple: (numpy array of LUT_DTYPE ordered by axis, temp index and point, dict of axis to calibration temps).
+    """
+    cal_temps = {}
+    rows = []
+    for line in lines:
+        if is_end_of_lut(line):
+            break
+        header = parse_cal_temps(line)
+        if header is not None:
+            cal_temps[header[0]] = header[1]
+            continue
+        data = line.strip().replace("+", "").split(",")
+        if len(data) >= 6 and data[1] in AXES and data[2].isdigit():
+            rows.append(data[1:6])
+
+    lut = numpy.empty(len(rows), dtype=LUT_DTYPE)
+    if not rows:
+        return lut, cal_temps
+
+    table = numpy.array(rows)
+    lut["axis"] = table[:, 0]
+    lut["temp_index"] = table[:, 1].astype(numpy.uint8)
+    lut["counts"] = table[:, 3].astype(numpy.float64)
+    lut["angle"] = table[:, 4].astype(numpy.float64)
+
+    return number_points(lut), cal_temps
+
+
+def number_points(lut: numpy.ndarray) -> numpy.ndarray:
+    """order a LUT by axis and temp index and number the points of each table.
+
+    The sort is stable, so points keep their dump order within a table. Batches parsed separately can be
+    concatenated and passed through here to get one consistently numbered LUT.
+
+    Args:
+        lut (numpy.ndarray): LUT rows in dump order.
+
+    Returns:
+        numpy.ndarray: the same rows, ordered by axis, temp index and point.
+    """
+    lut = lut[numpy.lexsort((lut["temp_index"], lut["axis"]))]
+    if len(lut) == 0:
+        return lut
+    group = numpy.r_[
+        True,
+        (lut["axis"][1:] != lut["axis"][:-1])
+        | (lut["temp_index"][1:] != lut["temp_index"][:-1]),
+    ]
+    starts = numpy.flatnonzero(group)
+    sizes = numpy.diff(numpy.r_[starts, len(lut)])
+    lut["point"] = numpy.arange(len(lut)) - numpy.repeat(starts, sizes)
+    return lut
+
+
+def lut_table(lut: numpy.ndarray, axis: str, temp_index: int) -> numpy.ndarray:
+    """slice one table out of a parsed LUT.
+
+    Args:
+        lut (numpy.ndarray): parsed LUT.
+        axis (str): "X" or "Y".
+        temp_index (int): calibration temperature, 0 to 2.
+
+    Returns:
+        numpy.ndarray: the table's rows, ordered by point.
+    """
+    return lut[(lut["axis"] == axis) & (lut["temp_index"] == temp_index)]
+
+
+def lut_curve(lut: numpy.ndarray, axis: str, temp_index: int) -> tuple:
+    """counts and angles of one table, ready to plot.
+
+    Args:
+        lut (numpy.ndarray): parsed LUT.
+        axis (str): "X" or "Y".
+        temp_index (int): calibration temperature, 0 to 2.
+
+    Returns:
+        tuple: (counts scaled by COUNTS_SCALE, angles) numpy arrays.
+    """
+    table = lut_table(lut, axis, temp_index)
+    return COUNTS_SCALE * table["counts"], table["angle"]
+
+
+def read_lut_log(path: str) -> tuple:
+    """parse a LUT dump from a "<datetime> - <line>" log written by JDx_configuration.
+
+    Args:
+        path (str): log file. The last complete dump in it is used.
+
+    Returns:
+        tuple: (LUT array, cal temps dict) as returned by parse_lut.
+    """
+    dumps = [[]]
+    with open(path) as file:
+        for line in file:
+            line = line.rstrip("\n").partition(" - ")[2]
+            dumps[-1].append(line)
+            if is_end_of_lut(line):
+                dumps.append([])
+    complete = dumps[-2] if len(dumps) > 1 else dumps[-1]
+    return parse_lut(complete)
+
+
+def compute_deviations(lut: numpy.ndarray, reference_temp_index: int = 1) -> numpy.ndarray:
+    """deviation of every LUT point from the same point in the reference temperature table.
+
+    Points are matched by their position in the table, so tables of unequal length (a partial dump, a table missing a
+    point) compare only the points both have.
+
+    Args:
+        lut (numpy.ndarray): parsed LUT.
+        reference_temp_index (int, optional): table the others are compared to. Defaults to 1, room temp.
+
+    Returns:
+        numpy.ndarray: DEVIATION_DTYPE rows, ordered by axis, temp index and point.
+    """
+    parts = []
+    for axis in AXES:
+        reference = lut_table(lut, axis, reference_temp_index)
+        for temp_index in TEMP_INDICES:
+            table = lut_table(lut, axis, temp_index)
+            points, table_rows, reference_rows = numpy.intersect1d(
+                table["point"], reference["point"], assume_unique=True, return_indices=True
+            )
+            part = numpy.empty(len(points), dtype=DEVIATION_DTYPE)
+            part["axis"] = axis
+            part["temp_index"] = temp_index
+            part["point"] = points
+            part["counts"] = table["counts"][table_rows]
+            part["deviation"] = reference["counts"][reference_rows] - part["counts"]
+            parts.append(part)
+    return numpy.concatenate(parts)
+
+
+def deviation_curve(deviations: numpy.ndarray, axis: str, temp_index: int) -> tuple:
+    """counts and deviations of one table, ready to plot.
+
+    Args:
+        deviations (numpy.ndarray): output of compute_deviations.
+        axis (str): "X" or "Y".
+        temp_index (int): calibration temperature, 0 to 2.
+
+    Returns:
+        tuple: (counts, deviations) numpy arrays, both scaled by COUNTS_SCALE.
+    """
+    rows = deviations[
+        (deviations["axis"] == axis) & (deviations["temp_index"] == temp_index)
+    ]
+    return COUNTS_SCALE * rows["counts"], COUNTS_SCALE * rows["deviation"]
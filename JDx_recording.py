@@ -0,0 +1,233 @@
+import argparse
+import datetime
+import json
+import os
+
+import numpy
+
+from JDx_acquisition import parse_sample
+
+
+RECORDING_VERSION = 1
+HEADER_FILE = "header.json"
+RECORDING_SUFFIX = ".jdxr"
+
+# one little-endian binary file per column, each row is one sample.
+COLUMNS = (
+    ("time", "<f8"),  # unix time in seconds
+    ("x", "<f4"),  # arc-deg
+    ("y", "<f4"),  # arc-deg
+    ("temperature", "<f4"),  # deg C
+)
+
+
+def recording_path_for(log_path: str) -> str:
+    """recording directory that sits next to a text log.
+
+    Args:
+        log_path (str): text log file path.
+
+    Returns:
+        str: the same path with the .jdxr suffix in place of the log extension.
+    """
+    return os.path.splitext(log_path)[0] + RECORDING_SUFFIX
+
+
+class JDx_Recorder:
+    """append samples to a columnar JDx recording.
+
+    A recording is a directory holding header.json (format version, sensor serial, settings, column layout) and one
+    raw fixed-width file per column, so each column can be mapped straight into a NumPy array with read_recording().
+    """
+
+    def __init__(self, path: str, serial_no: str = "", settings: dict = None):
+        """create the recording, or append to an existing one with the same layout.
+
+        Args:
+            path (str): recording directory.
+            serial_no (str, optional): serial number of the sensor. Defaults to "".
+            settings (dict, optional): sensor and acquisition settings to keep in the header. Defaults to None.
+
+        Raises:
+            ValueError: path holds a recording with a different version or column layout.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        header_path = os.path.join(path, HEADER_FILE)
+        if os.path.exists(header_path):
+            header = read_header(path)
+            if header["columns"] != [list(column) for column in COLUMNS]:
+                raise ValueError(f"{path} holds a recording with another layout")
+        else:
+            header = {
+                "version": RECORDING_VERSION,
+                "serial_no": serial_no,
+                "settings": settings or {},
+                "created": datetime.datetime.now().isoformat(),
+                "columns": [list(column) for column in COLUMNS],
+            }
+            with open(header_path, "w") as file:
+                json.dump(header, file, indent=4)
+        self.header = header
+
+        self._files = [
+            open(os.path.join(path, f"{name}.bin"), "ab") for name, _ in COLUMNS
+        ]
+
+    def append(self, time, x, y, temperature) -> None:
+        """append a batch of samples, one value per sample in each argument.
+
+        Args:
+            time (array-like): unix time of each sample.
+            x (array-like): x angle of each sample.
+            y (array-like): y angle of each sample.
+            temperature (array-like): temperature of each sample.
+        """
+        for file, (_, dtype), values in zip(
+            self._files, COLUMNS, (time, x, y, temperature)
+        ):
+            numpy.asarray(values, dtype=dtype).tofile(file)
+
+    def append_samples(self, samples, times) -> None:
+        """append parsed samples.
+
+        Args:
+            samples (list): acquisition samples.
+            times (array-like): unix time of each sample.
+        """
+        self.append(
+            times,
+            [sample.x for sample in samples],
+            [sample.y for sample in samples],
+            [sample.temperature for sample in samples],
+        )
+
+    def flush(self) -> None:
+        """push buffered column data to disk."""
+        for file in self._files:
+            file.flush()
+
+    def close(self) -> None:
+        """close the column files."""
+        for file in self._files:
+            file.close()
+        self._files = []
+
+
+def read_header(path: str) -> dict:
+    """read the header of a recording.
+
+    Args:
+        path (str): recording directory.
+
+    Raises:
+        ValueError: the recording was written by a newer version of the format.
+
+    Returns:
+        dict: recording header.
+    """
+    with open(os.path.join(path, HEADER_FILE)) as file:
+        header = json.load(file)
+    if header["version"] > RECORDING_VERSION:
+        raise ValueError(f"{path} uses recording format version {header['version']}")
+    return header
+
+
+def read_recording(path: str) -> tuple:
+    """map the columns of a recording into read-only NumPy arrays, without parsing or copying.
+
+    Args:
+        path (str): recording directory.
+
+    Returns:
+        tuple: (header dict, dict of column name to numpy array). Columns are truncated to the number of complete
+            rows, so a recording that is still being written can be read.
+    """
+    header = read_header(path)
+    sizes = {}
+    for name, dtype in header["columns"]:
+        size = os.path.getsize(os.path.join(path, f"{name}.bin"))
+        sizes[name] = size // numpy.dtype(dtype).itemsize
+    rows = min(sizes.values())
+
+    columns = {}
+    for name, dtype in header["columns"]:
+        if rows == 0:
+            columns[name] = numpy.empty(0, dtype=dtype)
+        else:
+            columns[name] = numpy.memmap(
+                os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,)
+            )
+    return header, columns
+
+
+def convert_text_log(
+    log_path: str, path: str, serial_no: str = "", settings: dict = None
+) -> int:
+    """convert a "<datetime> - ;addr,...,x,y,t" text log into a recording. Lines that are not samples are skipped.
+    Stamps with a fraction of the second, as JDx_display and JDx_stream write them, keep their resolution.
+
+    Args:
+        log_path (str): text log written by JDx_display.
+        path (str): recording directory to create or append to.
+        serial_no (str, optional): serial number of the sensor. Defaults to "".
+        settings (dict, optional): settings to keep in the header. Defaults to None.
+
+    Returns:
+        int: number of samples converted.
+    """
+    recorder = JDx_Recorder(path, serial_no=serial_no, settings=settings)
+    count = 0
+    times = []
+    samples = []
+    stamps = {}  # parse the date and time of each distinct second once.
+    with open(log_path) as file:
+        for line in file:
+            date_time, _, frame = line.partition(" - ")
+            # stamps may carry a fraction of the second, "2024-01-01 12:00:00.123456".
+            date_time, _, fraction = date_time.partition(".")
+            try:
+                sample = parse_sample(frame)
+                if date_time not in stamps:
+                    stamps[date_time] = datetime.datetime.strptime(
+                        date_time, "%Y-%m-%d %H:%M:%S"
+                    ).timestamp()
+                offset = float(f"0.{fraction}") if fraction else 0.0
+            except ValueError:
+                continue
+            times.append(stamps[date_time] + offset)
+            samples.append(sample)
+
+            if len(samples) >= 65536:
+                recorder.append_samples(samples, times)
+                count += len(samples)
+                times = []
+                samples = []
+
+    recorder.append_samples(samples, times)
+    count += len(samples)
+    recorder.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a JDx text log into a columnar binary recording."
+    )
+    parser.add_argument("log", help="text log written by JDx_display")
+    parser.add_argument(
+        "recording",
+        nargs="?",
+        help="recording directory, defaults to the log path with a .jdxr suffix",
+    )
+    parser.add_argument("--serial", default="", help="serial number of the sensor")
+    args = parser.parse_args()
+
+    path = args.recording or recording_path_for(args.log)
+    count = convert_text_log(args.log, path, serial_no=args.serial)
+    print(f"Converted {count} samples to {path}")
+
+
+if __name__ == "__main__":
+    main()
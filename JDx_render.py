@@ -0,0 +1,195 @@
+import math
+
+import numpy
+
+
+SYMBOL_SPACING = 8  # pixels between visible points below which symbols are no longer drawn
+RAW_POINTS_PER_PIXEL = 2  # visible points per pixel up to which the data is drawn as it is
+DEFAULT_PIXELS = 1000  # plot width assumed before the plot is laid out
+CACHED_LEVELS = 4  # bucket widths kept, so zooming back out does not recompute the envelope
+
+
+def decimate(x: numpy.ndarray, y: numpy.ndarray, width: float) -> tuple:
+    """min/max envelope of a curve, in buckets of constant x width aligned to multiples of the width.
+
+    Args:
+        x (numpy.ndarray): x values, ascending.
+        y (numpy.ndarray): y values.
+        width (float): bucket width, in x units.
+
+    Returns:
+        tuple: (bucket ids, x of the first sample in each bucket, minimum y, maximum y) numpy arrays, one value per
+            bucket holding samples. The id of a bucket is floor(x / width).
+    """
+    if len(x) == 0:
+        empty = numpy.empty(0)
+        return numpy.empty(0, dtype=numpy.int64), empty, empty, empty
+    ids = numpy.floor(x / width).astype(numpy.int64)
+    starts = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(ids)) + 1))
+    return (
+        ids[starts],
+        x[starts],
+        numpy.minimum.reduceat(y, starts),
+        numpy.maximum.reduceat(y, starts),
+    )
+
+
+class Decimating_Curve:
+    """draws a curve of any length through a pyqtgraph PlotDataItem at a cost set by the plot width.
+
+    The full resolution data stays with the caller. When more points are in view than the plot has pixels to show
+    them, the item is given a min/max envelope, at most one bucket per pixel, so spikes stay visible; otherwise it
+    is given the visible points as they are, with the item's symbols once they are far enough apart to read.
+
+    Envelopes are cached per bucket width, widths being powers of two so a view that keeps growing changes width
+    rarely. Data that only grows at the end and drops at the front, like a plot history, updates the cached
+    envelope with the new samples only, so the cost of a redraw does not grow with the history. Zooming and panning
+    redraw from the cache at the width that fits the new view.
+    """
+
+    def __init__(self, item):
+        """take over drawing an item.
+
+        Args:
+            item (pyqtgraph.PlotDataItem): item already added to a plot, as returned by PlotWidget.plot(). Its
+                symbol is drawn only when zoomed in.
+        """
+        self.item = item
+        self.symbol = item.opts["symbol"]
+        self._symbol_shown = self.symbol is not None
+        self.x = numpy.empty(0)
+        self.y = numpy.empty(0)
+        # first and last x of the data, kept apart as the data may be a view its owner has since written over.
+        self._span = None
+        self._levels = {}  # bucket width exponent to [ids, x, min y, max y], most recently used last
+        self._drawing = False
+        view = item.getViewBox()
+        view.sigXRangeChanged.connect(self.redraw)
+        view.sigResized.connect(self.redraw)
+
+    def set_data(self, x, y, appended: bool = False) -> None:
+        """replace the data and redraw.
+
+        Args:
+            x (array-like): x values. They are sorted here unless appended.
+            y (array-like): y values.
+            appended (bool, optional): the data is the previous data with samples added at the end, and possibly
+                some dropped from the front, as a plot history is. Only the new samples are decimated. Defaults to
+                False.
+        """
+        x = numpy.asarray(x, dtype=numpy.float64)
+        y = numpy.asarray(y, dtype=numpy.float64)
+        span = (x[0], x[-1]) if len(x) else None
+        if appended and span and self._span and span[0] >= self._span[0] and span[1] >= self._span[1]:
+            self.x, self.y = x, y
+            for exponent, level in self._levels.items():
+                self._levels[exponent] = self._extend(level, 2.0 ** exponent)
+        else:
+            if len(x) > 1 and numpy.any(x[1:] < x[:-1]):
+                order = numpy.argsort(x, kind="stable")
+                x, y = x[order], y[order]
+            self.x, self.y = x, y
+            self._levels.clear()
+        self._span = (x[0], x[-1]) if len(x) else None
+        self.redraw()
+
+    def redraw(self, *args) -> None:
+        """draw the part of the data that is in view, decimated to the plot width."""
+        if self._drawing:
+            return
+        self._drawing = True
+        try:
+            self.item.setData(*self._visible())
+        finally:
+            self._drawing = False
+
+    def _visible(self) -> tuple:
+        """points to hand to the item for the current view.
+
+        Returns:
+            tuple: (x, y) numpy arrays.
+        """
+        x, y = self.x, self.y
+        if len(x) == 0:
+            return x, y
+        view = self.item.getViewBox()
+        pixels = view.width() if view.width() > 0 else DEFAULT_PIXELS
+        if view.autoRangeEnabled()[0]:
+            # the view is about to fit the data, its current range is stale.
+            low, high = x[0], x[-1]
+        else:
+            low, high = view.viewRange()[0]
+
+        # one point either side of the view, so the lines run to its edges.
+        first = max(int(numpy.searchsorted(x, low)) - 1, 0)
+        last = min(int(numpy.searchsorted(x, high, side="right")) + 1, len(x))
+        count = last - first
+        if count <= RAW_POINTS_PER_PIXEL * pixels or high <= low:
+            self._show_symbols(count * SYMBOL_SPACING <= pixels)
+            return x[first:last], y[first:last]
+
+        self._show_symbols(False)
+        exponent = math.floor(math.log2((high - low) / pixels))
+        ids, starts, lows, highs = self._level(exponent)
+        first = max(int(numpy.searchsorted(starts, low)) - 1, 0)
+        last = min(int(numpy.searchsorted(starts, high, side="right")) + 1, len(starts))
+        # each bucket is drawn as a vertical stroke from its minimum to its maximum.
+        envelope_x = numpy.repeat(starts[first:last], 2)
+        envelope_y = numpy.column_stack((lows[first:last], highs[first:last])).ravel()
+        if last == len(starts):
+            # end on the latest sample, not on the extremes of the last bucket.
+            envelope_x = numpy.append(envelope_x, x[-1])
+            envelope_y = numpy.append(envelope_y, y[-1])
+        return envelope_x, envelope_y
+
+    def _level(self, exponent: int) -> list:
+        """cached envelope at a bucket width, computed when missing.
+
+        Args:
+            exponent (int): the bucket width is 2 ** exponent.
+
+        Returns:
+            list: [ids, x, min y, max y], see decimate.
+        """
+        level = self._levels.pop(exponent, None)
+        if level is None:
+            level = list(decimate(self.x, self.y, 2.0 ** exponent))
+            while len(self._levels) >= CACHED_LEVELS:
+                del self._levels[next(iter(self._levels))]
+        self._levels[exponent] = level
+        return level
+
+    def _extend(self, level: list, width: float) -> list:
+        """bring a cached envelope up to date with data that grew at the end and shrank at the front.
+
+        Only the first bucket, which may have lost samples, and the buckets from the last cached one on are
+        decimated again.
+
+        Args:
+            level (list): [ids, x, min y, max y] of the previous data.
+            width (float): bucket width.
+
+        Returns:
+            list: [ids, x, min y, max y] of the current data.
+        """
+        ids = level[0]
+        x, y = self.x, self.y
+        first_id = math.floor(x[0] / width)
+        head_end = int(numpy.searchsorted(x, (first_id + 1) * width))
+        tail_start = int(numpy.searchsorted(x, ids[-1] * width)) if len(ids) else 0
+        if tail_start <= head_end:
+            return list(decimate(x, y, width))
+
+        keep = slice(int(numpy.searchsorted(ids, first_id, side="right")), len(ids) - 1)
+        head = decimate(x[:head_end], y[:head_end], width)
+        tail = decimate(x[tail_start:], y[tail_start:], width)
+        return [
+            numpy.concatenate((head[column], level[column][keep], tail[column])) for column in range(4)
+        ]
+
+    def _show_symbols(self, show: bool) -> None:
+        """draw or hide the item's symbols, touching the item only when that changes."""
+        show = show and self.symbol is not None
+        if show != self._symbol_shown:
+            self._symbol_shown = show
+            self.item.setSymbol(self.symbol if show else None)
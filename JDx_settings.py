@@ -0,0 +1,234 @@
+import dataclasses
+import json
+
+from JDx_cache import Sensor_Identity
+
+
+# everything parse_settings needs, sent as one batch.
+SETTINGS_COMMANDS = (
+    ";000,q,q",
+    ";000,q,gf",
+    ";000,q,be",
+    ";000,q,bl",
+    ";000,q,b",
+    ";000,q,ma0",
+    ";000,q,ma1",
+    ";000,q,ma2",
+    ";000,q,mb",
+)
+
+AXES = "xyz"
+
+
+@dataclasses.dataclass
+class JDx_Settings:
+    """settings of one JDx sensor, independent of any widget.
+
+    Text fields hold the values as the sensor reports them. The orthonormalization matrix is stored row by row,
+    matrix[row][column], with the rows x, y and z.
+    """
+
+    __slots__ = (
+        "model",
+        "serial_no",
+        "fw_version",
+        "mfg_date",
+        "streaming",
+        "test_mode",
+        "decimation",
+        "odr",
+        "relative_offset",
+        "temp_sensor_gain",
+        "temp_sensor_offset",
+        "g_vector",
+        "maf",
+        "maf_length",
+        "bandwidth",
+        "matrix",
+        "offsets",
+    )
+
+    # identity
+    model: str
+    serial_no: str
+    fw_version: str
+    mfg_date: str
+    # output
+    streaming: bool
+    test_mode: bool
+    decimation: str
+    odr: str
+    relative_offset: str
+    # temperature sensor
+    temp_sensor_gain: str
+    temp_sensor_offset: str
+    # filter
+    g_vector: str
+    maf: str
+    maf_length: str
+    bandwidth: str
+    # orthonormalization
+    matrix: tuple  # 3 rows of 3 floats
+    offsets: tuple  # 3 floats
+
+    @property
+    def identity(self) -> Sensor_Identity:
+        """the fields the LUT cache keys on."""
+        return Sensor_Identity(self.model, self.serial_no, self.fw_version, self.mfg_date)
+
+    def diff(self, other: "JDx_Settings") -> dict:
+        """settings that differ between two sensors.
+
+        Args:
+            other (JDx_Settings): settings to compare to.
+
+        Returns:
+            dict: field name to (own value, other value), only for the fields that differ.
+        """
+        differences = {}
+        for name in self.__slots__:
+            mine = getattr(self, name)
+            theirs = getattr(other, name)
+            if mine != theirs:
+                differences[name] = (mine, theirs)
+        return differences
+
+    def to_dict(self) -> dict:
+        """field name to value, with the matrix and offsets as lists.
+
+        Returns:
+            dict: JSON ready settings.
+        """
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["matrix"] = [list(row) for row in self.matrix]
+        data["offsets"] = list(self.offsets)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "JDx_Settings":
+        """rebuild settings from to_dict() output.
+
+        Args:
+            data (dict): field name to value.
+
+        Raises:
+            KeyError: a field is missing.
+
+        Returns:
+            JDx_Settings: the settings.
+        """
+        values = {name: data[name] for name in cls.__slots__}
+        values["matrix"] = tuple(tuple(float(value) for value in row) for row in data["matrix"])
+        values["offsets"] = tuple(float(value) for value in data["offsets"])
+        return cls(**values)
+
+    def to_json(self) -> str:
+        """serialize the settings.
+
+        Returns:
+            str: JSON object of the fields.
+        """
+        return json.dumps(self.to_dict(), indent=4)
+
+    @classmethod
+    def from_json(cls, text: str) -> "JDx_Settings":
+        """parse to_json() output.
+
+        Args:
+            text (str): JSON object of the fields.
+
+        Returns:
+            JDx_Settings: the settings.
+        """
+        return cls.from_dict(json.loads(text))
+
+    def widget_text(self) -> dict:
+        """text of the settings line edits of JDx_configuration.
+
+        Returns:
+            dict: line edit name (without the _le suffix) to text.
+        """
+        text = {
+            name: getattr(self, name)
+            for name in self.__slots__
+            if name not in ("streaming", "test_mode", "matrix", "offsets")
+        }
+        text["streaming_status"] = "On" if self.streaming else "Off"
+        text["test_mode"] = "On" if self.test_mode else "Off"
+        for row, values in zip(AXES, self.matrix):
+            for column, value in zip(AXES, values):
+                text[f"c_{row}{column}"] = f"{value:.5f}"
+        for axis, value in zip(AXES, self.offsets):
+            text[f"O_{axis}"] = f"{value:.5f}"
+        return text
+
+
+def _values(response: str) -> tuple:
+    """the three numbers after the colon of a ;000,q,ma<n> or ;000,q,mb response."""
+    values = response.replace(" ", "").split(":")[1].split(",")
+    return tuple(float(value) for value in values[:3])
+
+
+def parse_settings(responses: dict) -> JDx_Settings:
+    """build the settings from the responses to SETTINGS_COMMANDS.
+
+    Args:
+        responses (dict): command to response, as returned by query_batch.
+
+    Raises:
+        KeyError: a command has no response.
+        IndexError: a response is shorter than expected.
+        ValueError: a response holds a malformed number.
+
+    Returns:
+        JDx_Settings: the parsed settings.
+    """
+    data = {command: responses[command].replace("+", "").strip() for command in SETTINGS_COMMANDS}
+
+    fields = data[";000,q,q"].split(",")
+
+    def value(index: int) -> str:
+        return fields[index].split("=")[1]
+
+    # each ;000,q,ma<n> reply is one column of the matrix.
+    columns = [_values(data[f";000,q,ma{i}"]) for i in range(3)]
+
+    return JDx_Settings(
+        model=fields[4],
+        serial_no=fields[5],
+        fw_version=fields[6].split(" ")[1],
+        mfg_date=value(10),
+        streaming=int(value(14)) == 1,
+        test_mode=int(value(15)) == 1,
+        decimation=value(21),
+        odr=value(20),
+        relative_offset=value(17),
+        temp_sensor_gain=value(18),
+        temp_sensor_offset=value(19),
+        g_vector=data[";000,q,gf"].split(",")[3].split(":")[1].replace(" ", ""),
+        maf=data[";000,q,be"].split(",")[4],
+        maf_length=data[";000,q,bl"].split(",")[3],
+        bandwidth=data[";000,q,b"].split(",")[5],
+        matrix=tuple(zip(*columns)),
+        offsets=_values(data[";000,q,mb"]),
+    )
+
+
+def reply_odr(reply: str) -> float:
+    """output data rate in a ;000,q,q reply, from its ODR= field.
+
+    Args:
+        reply (str): response to ;000,q,q.
+
+    Returns:
+        float: frames per second the sensor streams at, None when the reply does not hold a valid rate.
+    """
+    for field in reply.strip().split(","):
+        name, _, value = field.partition("=")
+        if name.strip() == "ODR":
+            try:
+                odr = float(value)
+            except ValueError:
+                return None
+            return odr if odr > 0 else None
+    return None
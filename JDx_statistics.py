@@ -0,0 +1,254 @@
+import bisect
+import json
+import time
+
+import numpy
+
+
+class Stream_Statistics:
+    """running counters for a JDx stream: frames received, frames that did not parse and host overruns."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.frames = 0
+        self.bad_frames = 0
+        self.overruns = 0
+        self.rate = 0.0  # frames/s since the previous update_rate() call
+        self._mark_time = self.started
+        self._mark_frames = 0
+
+    def add(self, frames: int, bad_frames: int = 0) -> None:
+        """count a batch of frames.
+
+        Args:
+            frames (int): frames received, good and bad.
+            bad_frames (int, optional): frames among them that did not parse. Defaults to 0.
+        """
+        self.frames += frames
+        self.bad_frames += bad_frames
+
+    def update_rate(self) -> float:
+        """measure the frame rate since the previous call.
+
+        Returns:
+            float: frames/s.
+        """
+        now = time.monotonic()
+        elapsed = now - self._mark_time
+        if elapsed > 0:
+            self.rate = (self.frames - self._mark_frames) / elapsed
+        self._mark_time = now
+        self._mark_frames = self.frames
+        return self.rate
+
+    @property
+    def elapsed(self) -> float:
+        """seconds since the statistics were started."""
+        return time.monotonic() - self.started
+
+    @property
+    def average_rate(self) -> float:
+        """frames/s since the statistics were started."""
+        elapsed = self.elapsed
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        """one-line report of the counters.
+
+        Returns:
+            str: rate, totals, bad frames and overruns.
+        """
+        return (
+            f"{self.rate:8.1f} Hz (avg {self.average_rate:.1f} Hz), "
+            f"{self.frames} frames, {self.bad_frames} bad, {self.overruns} overruns"
+        )
+
+
+def interval_statistics(times) -> tuple:
+    """effective rate and read jitter of a run of sample receipt times.
+
+    Samples read from the port together share one receipt time, so the jitter is measured between reads, not
+    between samples. In poll mode every read is one sample.
+
+    Args:
+        times (array-like): receipt times in seconds, oldest first.
+
+    Returns:
+        tuple: (samples/s, standard deviation of the intervals between reads in seconds). Zeros when there are too
+            few samples or reads.
+    """
+    times = numpy.asarray(times, dtype=numpy.float64)
+    if len(times) < 3:
+        return 0.0, 0.0
+    span = times[-1] - times[0]
+    rate = float((len(times) - 1) / span) if span > 0 else 0.0
+    reads = times[numpy.concatenate(([True], numpy.diff(times) > 0))]
+    if len(reads) < 3:
+        return rate, 0.0
+    return rate, float(numpy.diff(reads).std())
+
+
+LATENCY_MIN = 1e-5  # seconds, lower edge of the first histogram bucket
+LATENCY_DECADES = 7  # buckets reach LATENCY_MIN * 10**LATENCY_DECADES, 100 s
+LATENCY_BUCKETS_PER_DECADE = 20  # about 12% wide buckets
+
+
+class Latency_Histogram:
+    """round trip times of one command, in fixed log-spaced buckets.
+
+    Recording is a bisect and an increment whatever the number of samples, and percentiles are read from the
+    buckets, so they are accurate to one bucket width (about 12%).
+    """
+
+    EDGES = [
+        LATENCY_MIN * 10 ** (i / LATENCY_BUCKETS_PER_DECADE)
+        for i in range(LATENCY_DECADES * LATENCY_BUCKETS_PER_DECADE + 1)
+    ]
+
+    def __init__(self):
+        # one bucket below the first edge and one above the last.
+        self.counts = [0] * (len(self.EDGES) + 1)
+        self.count = 0
+        self.timeouts = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """count one answered request.
+
+        Args:
+            seconds (float): time from sending the request to receiving the answer.
+        """
+        self.counts[bisect.bisect(self.EDGES, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def record_timeout(self) -> None:
+        """count one request that was never answered."""
+        self.timeouts += 1
+
+    def percentile(self, percent: float) -> float:
+        """round trip time below which a share of the answered requests fall.
+
+        Args:
+            percent (float): 0 to 100.
+
+        Returns:
+            float: seconds, the upper edge of the bucket holding the percentile. 0.0 before any request.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = percent / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                edge = self.EDGES[min(index, len(self.EDGES) - 1)]
+                return min(edge, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        """mean round trip time in seconds."""
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> str:
+        """one-line report of the histogram.
+
+        Returns:
+            str: count, p50, p95, p99, max and timeouts.
+        """
+        return (
+            f"n={self.count} p50 {1000 * self.percentile(50):.1f} ms, p95 {1000 * self.percentile(95):.1f} ms, "
+            f"p99 {1000 * self.percentile(99):.1f} ms, max {1000 * self.max:.1f} ms, {self.timeouts} timeouts"
+        )
+
+    def to_dict(self) -> dict:
+        """the histogram and its percentiles, JSON ready.
+
+        Returns:
+            dict: counts, percentiles and the non-empty buckets as [upper edge in seconds, count].
+        """
+        buckets = [
+            [self.EDGES[index] if index < len(self.EDGES) else None, count]
+            for index, count in enumerate(self.counts)
+            if count
+        ]
+        return {
+            "count": self.count,
+            "timeouts": self.timeouts,
+            "mean_s": self.mean,
+            "p50_s": self.percentile(50),
+            "p95_s": self.percentile(95),
+            "p99_s": self.percentile(99),
+            "max_s": self.max,
+            "buckets": buckets,
+        }
+
+
+class Command_Latency:
+    """round trip histograms per command type ("q,q", "v,v", ...)."""
+
+    def __init__(self):
+        self.histograms = {}
+
+    def histogram(self, command: str) -> Latency_Histogram:
+        """the histogram of a command type, created on first use.
+
+        Args:
+            command (str): command type.
+
+        Returns:
+            Latency_Histogram: its histogram.
+        """
+        histogram = self.histograms.get(command)
+        if histogram is None:
+            histogram = self.histograms.setdefault(command, Latency_Histogram())
+        return histogram
+
+    def record(self, command: str, seconds: float) -> None:
+        """count one answered request.
+
+        Args:
+            command (str): command type.
+            seconds (float): round trip time.
+        """
+        self.histogram(command).record(seconds)
+
+    def record_timeout(self, command: str) -> None:
+        """count one request that was never answered.
+
+        Args:
+            command (str): command type.
+        """
+        self.histogram(command).record_timeout()
+
+    def summary(self) -> str:
+        """report of every command type, one line each.
+
+        Returns:
+            str: the report, empty before any request.
+        """
+        return "\n".join(
+            f"{command:8} {histogram.summary()}"
+            for command, histogram in sorted(self.histograms.items())
+        )
+
+    def to_dict(self) -> dict:
+        """every histogram, JSON ready.
+
+        Returns:
+            dict: command type to Latency_Histogram.to_dict().
+        """
+        return {command: histogram.to_dict() for command, histogram in sorted(self.histograms.items())}
+
+    def export(self, path: str) -> None:
+        """save every histogram to a JSON file.
+
+        Args:
+            path (str): file to write.
+        """
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=4)
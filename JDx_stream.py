@@ -1,14 +1,46 @@
-import serial
+import argparse
+import bisect
+import collections
+import concurrent.futures
+import datetime
+import math
+import signal
 import time
 
 from serial.tools import list_ports
 
+from JDx_acquisition import (
+    JDx_Acquisition_Worker,
+    OVERRUN_BYTES,
+    STREAM_MODE,
+    parse_sample,
+)
+from JDx_cache import sensor_identity
+from JDx_log import SAMPLE_PRECISION, JDx_Log_Writer
+from JDx_recording import JDx_Recorder, RECORDING_SUFFIX
+from JDx_statistics import Stream_Statistics
+from JDx_transport import open_serial_connection
 
-def open_serial_port(port, baud):
+
+# serial settings tried by autodetect_jdx, most likely first. the JDx ships at 19200 baud, even parity.
+DETECT_BAUD_RATES = (19200, 9600, 38400, 57600, 115200)
+DETECT_PARITIES = ("E", "N", "O")
+DETECT_TIMEOUT = 0.5  # seconds to wait for a ;000,q,q reply at one setting
+DETECT_DEADLINE = 10.0  # seconds for the whole scan
+
+CONSOLE_INTERVAL = 0.1  # seconds between console refreshes while streaming
+
+# a JDx answering ;000,q,q on a port, with the open connection and the settings that worked.
+Detected_JDx = collections.namedtuple(
+    "Detected_JDx", ["port", "baud", "parity", "dev", "reply"]
+)
+
+
+def open_serial_port(port, baud, parity="E", timeout=1):
 
     dev = None
     try:
-        dev = serial.Serial(port, baud, parity="E", timeout=1)
+        dev = open_serial_connection(port, baud, parity=parity, timeout=timeout)
     except Exception as e:
         print(e)
     return dev
@@ -16,58 +48,391 @@ def open_serial_port(port, baud):
 
 def serial_send(dev, packet):
 
-    dev.write(packet.encode())
+    dev.write(packet)
     return
 
 
 def serial_read(dev):
-    return dev.readline().decode("utf-8")
+    return dev.read_line()
+
+
+def serial_number(reply: str) -> str:
+    """serial number in a ;000,q,q reply.
+
+    Args:
+        reply (str): response to ;000,q,q.
 
+    Returns:
+        str: the serial number, "" when the reply does not hold one.
+    """
+    try:
+        return sensor_identity(reply).serial_no
+    except ValueError:
+        return ""
+
+
+def is_jdx_reply(data):
+    """check that a ;000,q,q reply came from a JDx at the right settings, not line noise at the wrong baud.
+
+    Args:
+        data (str): reply read from the port.
 
-def autodetect_jdx():
+    Returns:
+        bool: True for a well-formed reply.
+    """
+    data = data.rstrip()
+    return data.count(",") >= 4 and data.isprintable()
 
-    baud = 19200
-    ports_list = list_ports.comports()
 
-    for port, desc, hwid in sorted(ports_list):
-        print(f"Trying port {port}")
+def probe_port(port, settings, deadline):
+    """try each serial setting on one port until a JDx answers.
+
+    Args:
+        port (str): serial port.
+        settings (list): (baud, parity) pairs, in the order to try them.
+        deadline (float): time.monotonic() after which to give up.
+
+    Returns:
+        Detected_JDx: the sensor found, or None.
+    """
+    for baud, parity in settings:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        dev = open_serial_port(port, baud, parity, timeout=min(DETECT_TIMEOUT, remaining))
+        if dev is None:
+            # the port itself cannot be opened, other settings will not help.
+            return None
         try:
-            dev = open_serial_port(port, baud)
-            if dev is not None:
-                serial_send(dev, ";000,q,q\r\n")
-                data = serial_read(dev)
-                print(data)
-                if data != "":
-                    print("Port found")
-                    break
-                else:
-                    dev.close()
+            dev.reset()
+            serial_send(dev, ";000,q,q\r\n")
+            data = serial_read(dev)
+            if is_jdx_reply(data) and time.monotonic() < deadline:
+                dev.timeout = 1
+                return Detected_JDx(port, baud, parity, dev, data)
         except Exception as e:
             print(e)
+        dev.close()
+    return None
 
-    return dev
+
+def autodetect_jdx(
+    baud_rates=DETECT_BAUD_RATES, parities=DETECT_PARITIES, deadline=DETECT_DEADLINE
+):
+    """find every JDx connected to the machine.
+
+    Ports are probed in parallel. On each port the baud/parity combinations are tried in turn until the first valid
+    ;000,q,q reply.
+
+    Args:
+        baud_rates (tuple, optional): baud rates to try. Defaults to DETECT_BAUD_RATES.
+        parities (tuple, optional): parities to try. Defaults to DETECT_PARITIES.
+        deadline (float, optional): seconds allowed for the whole scan. Defaults to DETECT_DEADLINE.
+
+    Returns:
+        list: Detected_JDx for each sensor found, sorted by port. Their connections are left open.
+    """
+    ports = sorted(port.device for port in list_ports.comports())
+    if not ports:
+        return []
+    print(f"Scanning {len(ports)} ports")
+
+    settings = [(baud, parity) for baud in baud_rates for parity in parities]
+    end = time.monotonic() + deadline
+    found = []
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(ports))
+    futures = [executor.submit(probe_port, port, settings, end) for port in ports]
+    done, not_done = concurrent.futures.wait(futures, timeout=deadline)
+    # probes still running give up at the deadline on their own.
+    executor.shutdown(wait=False)
+
+    for future in done:
+        sensor = future.result()
+        if sensor is not None:
+            print(f"Found JDx on {sensor.port} at {sensor.baud} baud, parity {sensor.parity}")
+            found.append(sensor)
+    if not_done:
+        print(f"{len(not_done)} ports did not finish before the deadline")
+
+    return sorted(found, key=lambda sensor: sensor.port)
 
 
 def start_stream(dev):
+    """stream one JDx to the terminal.
+
+    Every frame waiting on the port is drained on each pass, acquisition never sleeps. Only the console line is
+    throttled, to CONSOLE_INTERVAL, and it reports the effective frame rate, frames that did not parse and host
+    overruns (the port backlog growing past OVERRUN_BYTES, where the driver starts dropping data).
+
+    Args:
+        dev (JDx_Transport): open transport to the sensor.
+
+    Returns:
+        Stream_Statistics: counters for the whole stream.
+    """
+    stats = Stream_Statistics()
+    last_print = 0.0
+    last_frame = ""
     serial_send(dev, ";000,s,1\r\n")
     while True:
         try:
-            data = serial_read(dev)
-            print(data.rstrip(), end="\r")
-            time.sleep(0.01)
+            frames = dev.read_frames()
+            if frames:
+                last_frame = frames[-1]
+                stats.add(len(frames), sum(1 for frame in frames if not is_sample(frame)))
+            if dev.backlog > OVERRUN_BYTES:
+                stats.overruns += 1
+
+            now = time.monotonic()
+            if now - last_print >= CONSOLE_INTERVAL:
+                last_print = now
+                stats.update_rate()
+                print(f"{last_frame}  {stats.summary()}".ljust(120), end="\r")
         except KeyboardInterrupt:
             break
         except Exception as e:
             print(e)
 
     serial_send(dev, ";000,s,0\r\n")
+    print()
+    print(stats.summary())
+    return stats
+
+
+def is_sample(frame):
+    """check whether a streamed frame holds a sample.
+
+    Args:
+        frame (str): frame from the sensor.
+
+    Returns:
+        bool: True when the frame parses.
+    """
+    try:
+        parse_sample(frame)
+    except ValueError:
+        return False
+    return True
+
+
+def stream_all(found):
+    """stream every detected JDx at once, one acquisition thread per port, printing one merged stream.
+
+    Rows are printed in order of receipt. A row is held back until every port has read past it, so a port that
+    lags behind cannot print a sample older than one already printed; a silent port holds the stream for up to
+    its read timeout.
+
+    Args:
+        found (list): Detected_JDx for each sensor.
+    """
+    workers = []
+    for sensor in found:
+        serial_no = serial_number(sensor.reply)
+        worker = JDx_Acquisition_Worker(sensor.dev, mode=STREAM_MODE)
+        worker.start()
+        workers.append((sensor.port, serial_no, worker))
+
+    # one clock anchor for every port, so the printed times are as ordered as the rows.
+    wall, monotonic = time.time(), time.monotonic()
+    pending = []  # (receipt time, port, serial number, sample) not printed yet
+
+    def print_rows(rows):
+        for received, port, serial_no, sample in rows:
+            date_time = datetime.datetime.fromtimestamp(wall + received - monotonic).isoformat()
+            print(
+                f"{date_time},{port},{sample.address.lstrip(';')},{serial_no},"
+                f"{sample.x},{sample.y},{sample.temperature}"
+            )
+
+    print("time,port,address,serial,x,y,temperature")
+    while True:
+        try:
+            # read before taking the samples: everything stamped up to the watermark is queued by then. a worker
+            # that has exited reads no more, it does not hold the others back.
+            watermark = min(
+                (worker.last_read for _, _, worker in workers if worker.is_alive()), default=math.inf
+            )
+            for port, serial_no, worker in workers:
+                for error in worker.take_errors():
+                    print(f"{port}: {error}")
+                for sample in worker.take_samples():
+                    pending.append((sample.time, port, serial_no, sample))
+            pending.sort(key=lambda record: record[0])
+
+            ready = bisect.bisect_right([record[0] for record in pending], watermark)
+            print_rows(pending[:ready])
+            del pending[:ready]
+            time.sleep(0.05)
+        except KeyboardInterrupt:
+            break
+
+    for port, serial_no, worker in workers:
+        worker.stop()
+        for sample in worker.take_samples():
+            pending.append((sample.time, port, serial_no, sample))
+    pending.sort(key=lambda record: record[0])
+    print_rows(pending)
+
+
+def record(dev, path, duration=None, samples=None, stats_interval=1.0, settings=None, serial_no=""):
+    """record the stream of one JDx to a file, without any GUI.
+
+    A path ending in .jdxr is written as a columnar binary recording, anything else as a "<datetime> - <frame>" text
+    log like the one JDx_display writes. Throughput, receipt-to-disk latency, bad frames and overruns are printed
+    every stats_interval seconds. The stream is turned off with ;000,s,0 however the recording ends.
+
+    Args:
+        dev (JDx_Transport): open transport to the sensor.
+        path (str): output file or .jdxr recording directory.
+        duration (float, optional): seconds to record. Defaults to no limit.
+        samples (int, optional): samples to record. Defaults to no limit.
+        stats_interval (float, optional): seconds between statistics lines. Defaults to 1.0.
+        settings (dict, optional): settings to keep in a binary recording's header. Defaults to None.
+        serial_no (str, optional): serial number to keep in a binary recording's header. Defaults to "".
+
+    Returns:
+        int: samples recorded.
+    """
+    if path.endswith(RECORDING_SUFFIX):
+        recorder = JDx_Recorder(path, serial_no=serial_no, settings=settings)
+        log_writer = None
+    else:
+        recorder = None
+        log_writer = JDx_Log_Writer(path, precision=SAMPLE_PRECISION)
+
+    worker = JDx_Acquisition_Worker(dev, mode=STREAM_MODE)
+    worker.start()
+    started = time.monotonic()
+    last_stats = started
+    count = 0
+    latencies = []
+
+    def write(batch):
+        if recorder is not None:
+            recorder.append_samples(batch, [worker.wall_time(sample.time) for sample in batch])
+        else:
+            log_writer.write_stamped(
+                (sample.frame for sample in batch), [worker.wall_time(sample.time) for sample in batch]
+            )
+        # the oldest sample in the batch waited the longest.
+        latencies.append(time.monotonic() - batch[0].time)
+
+    try:
+        while True:
+            for error in worker.take_errors():
+                print(error)
+            batch = worker.take_samples()
+            if samples is not None:
+                batch = batch[: samples - count]
+            if batch:
+                write(batch)
+                count += len(batch)
+
+            now = time.monotonic()
+            if now - last_stats >= stats_interval:
+                last_stats = now
+                worker.stats.update_rate()
+                latency = (
+                    f"latency avg {1000 * sum(latencies) / len(latencies):.1f} ms "
+                    f"max {1000 * max(latencies):.1f} ms"
+                    if latencies
+                    else "latency n/a"
+                )
+                latencies = []
+                print(f"{now - started:8.1f} s  {count} samples  {worker.stats.summary()}, {latency}")
+
+            if samples is not None and count >= samples:
+                break
+            if duration is not None and now - started >= duration:
+                break
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+        batch = worker.take_samples()
+        if samples is not None:
+            batch = batch[: samples - count]
+        if batch:
+            write(batch)
+            count += len(batch)
+        if recorder is not None:
+            recorder.close()
+        else:
+            log_writer.close()
+
+    print(f"Recorded {count} samples to {path}. {worker.stats.summary()}")
+    return count
+
+
+def stop_on_sigterm(signum, frame):
+    # let `kill` and `timeout` end a recording the same way CTRL+C does.
+    raise KeyboardInterrupt
 
 
 def main():
-    dev = autodetect_jdx()
+    parser = argparse.ArgumentParser(description="Stream the output of JDx sensors.")
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="stream every detected JDx at once as one merged, timestamped stream",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help=f"record the stream to FILE, a text log or a {RECORDING_SUFFIX} binary recording",
+    )
+    parser.add_argument("--duration", type=float, help="seconds to record")
+    parser.add_argument("--samples", type=int, help="samples to record")
+    parser.add_argument(
+        "--stats-interval",
+        type=float,
+        default=1.0,
+        help="seconds between statistics lines while recording",
+    )
+    parser.add_argument("--port", help="serial port or pyserial URL (see JDx_emulator), skips autodetection")
+    parser.add_argument("--baud", type=int, default=19200, help="baud rate with --port")
+    parser.add_argument(
+        "--parity", default="E", choices=("E", "N", "O"), help="parity with --port"
+    )
+    args = parser.parse_args()
+    if args.record and args.all:
+        # record() follows one sensor, recording several at once would need one file per sensor.
+        parser.error("--record records one sensor, it cannot be combined with --all")
+
+    if args.port:
+        dev = open_serial_port(args.port, args.baud, args.parity)
+        if dev is None:
+            return
+        # autodetection identifies the sensor on the way, a given port is asked here.
+        serial_send(dev, ";000,q,q\r\n")
+        found = [Detected_JDx(args.port, args.baud, args.parity, dev, serial_read(dev))]
+    else:
+        found = autodetect_jdx()
+        if not found:
+            print("No JDx found")
+            return
+
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
     print("Press CTRL+C to stop")
-    start_stream(dev)
-    dev.close()
+    if args.record:
+        sensor = found[0]
+        record(
+            sensor.dev,
+            args.record,
+            duration=args.duration,
+            samples=args.samples,
+            stats_interval=args.stats_interval,
+            settings={"port": sensor.port, "baud": sensor.baud, "parity": sensor.parity},
+            serial_no=serial_number(sensor.reply),
+        )
+    elif args.all:
+        stream_all(found)
+    else:
+        start_stream(found[0].dev)
+
+    for sensor in found:
+        sensor.dev.close()
 
 
 if __name__ == "__main__":
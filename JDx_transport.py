@@ -0,0 +1,290 @@
+import collections
+import time
+
+import serial
+
+from JDx_statistics import Command_Latency
+
+
+FRAME_TERMINATOR = b"\r\n"
+
+
+class JDx_Transport:
+    """buffered transport for a JDx serial connection.
+
+    Bytes are pulled from the port in large chunks (everything the driver has waiting) and split into
+    frames on the JDx "\\r\\n" terminator here, instead of paying one timeout-bound readline per frame.
+    """
+
+    def __init__(self, connection: serial.Serial):
+        """wrap an open serial connection.
+
+        Args:
+            connection (serial.Serial): open serial connection
+        """
+        self.connection = connection
+        self._buffer = bytearray()
+        self._frames = collections.deque()
+        # largest number of bytes waiting at the port during the last read_frames(), measured before reading them.
+        self.backlog = 0
+        # round trip times of the requests made with query() and query_batch().
+        self.latency = Command_Latency()
+
+    @property
+    def timeout(self) -> float:
+        """read timeout of the underlying connection in seconds."""
+        return self.connection.timeout
+
+    @timeout.setter
+    def timeout(self, timeout: float) -> None:
+        self.connection.timeout = timeout
+
+    @property
+    def baud(self) -> int:
+        """baud rate of the host side of the connection."""
+        return self.connection.baudrate
+
+    @baud.setter
+    def baud(self, baud: int) -> None:
+        # bytes buffered at the old rate are garbage at the new one.
+        self.connection.baudrate = baud
+        self.reset()
+
+    def transfer_time(self, size: int, baud: int = None) -> float:
+        """seconds needed to move bytes over the line, counting start, parity and stop bits.
+
+        Args:
+            size (int): number of bytes.
+            baud (int, optional): baud rate. Defaults to the current one.
+
+        Returns:
+            float: transfer time in seconds.
+        """
+        bits = 1 + self.connection.bytesize + self.connection.stopbits
+        if self.connection.parity != serial.PARITY_NONE:
+            bits += 1
+        return size * bits / (baud or self.baud)
+
+    @property
+    def in_waiting(self) -> int:
+        """number of bytes waiting, in the driver and in the transport buffer."""
+        return self.connection.in_waiting + len(self._buffer)
+
+    def write(self, packet: str) -> None:
+        """send ascii data to the sensor.
+
+        Args:
+            packet (str): data to send over connection.
+        """
+        self.connection.write(packet.encode())
+
+    def _fill(self, block: bool) -> int:
+        """move waiting bytes from the port into the frame buffer.
+
+        Args:
+            block (bool): wait up to the connection timeout for the first byte when nothing is waiting.
+
+        Returns:
+            int: number of bytes read.
+        """
+        waiting = self.connection.in_waiting
+        if waiting == 0:
+            if not block:
+                return 0
+            # block for the first byte, then sweep up whatever arrived behind it.
+            chunk = self.connection.read(1)
+            if not chunk:
+                return 0
+            waiting = self.connection.in_waiting
+            if waiting:
+                chunk += self.connection.read(waiting)
+        else:
+            chunk = self.connection.read(waiting)
+
+        self._buffer += chunk
+        self._split()
+        return len(chunk)
+
+    def _split(self) -> None:
+        """move complete frames out of the byte buffer."""
+        end = self._buffer.rfind(FRAME_TERMINATOR)
+        if end < 0:
+            return
+        complete = bytes(self._buffer[:end])
+        del self._buffer[: end + len(FRAME_TERMINATOR)]
+        self._frames.extend(
+            frame.decode("utf-8", errors="replace")
+            for frame in complete.split(FRAME_TERMINATOR)
+        )
+
+    def read_frames(self, block: bool = True) -> list:
+        """read every complete frame available.
+
+        Args:
+            block (bool, optional): wait up to the connection timeout for at least one frame. Defaults to True.
+
+        Returns:
+            list: complete frames with the terminator stripped, oldest first. Empty on timeout.
+        """
+        self.backlog = self._fill(block=False)
+        if block and not self._frames:
+            deadline = time.monotonic() + (self.timeout or 0)
+            while not self._frames:
+                self.backlog = max(self.backlog, self._fill(block=True))
+                if time.monotonic() >= deadline:
+                    break
+
+        frames = list(self._frames)
+        self._frames.clear()
+        return frames
+
+    def read_line(self) -> str:
+        """read a single frame, waiting up to the connection timeout.
+
+        Returns:
+            str: the frame including its "\\r\\n" terminator, like readline(). Empty on timeout.
+        """
+        if not self._frames:
+            deadline = time.monotonic() + (self.timeout or 0)
+            while not self._frames:
+                self._fill(block=True)
+                if time.monotonic() >= deadline:
+                    break
+            if not self._frames:
+                return ""
+        return self._frames.popleft() + "\r\n"
+
+    def query(self, packet: str) -> str:
+        """send a request and read its one-line answer, timing the round trip.
+
+        Args:
+            packet (str): request, with its terminator.
+
+        Returns:
+            str: the answer including its "\r\n" terminator. Empty on timeout, which is counted as one.
+        """
+        name = command_name(packet)
+        sent = time.monotonic()
+        self.write(packet)
+        line = self.read_line()
+        if line:
+            self.latency.record(name, time.monotonic() - sent)
+        else:
+            self.latency.record_timeout(name)
+        return line
+
+    def reset(self) -> None:
+        """drop any buffered bytes and frames, on the host and in the driver."""
+        self._buffer.clear()
+        self._frames.clear()
+        self.connection.reset_input_buffer()
+
+    def close(self) -> None:
+        """close the underlying connection."""
+        self.connection.close()
+
+
+def open_serial_connection(
+    port: str, baud: int, parity: str, timeout: float = 5
+) -> JDx_Transport:
+    """open serial port to JDx sensor.
+
+    Args:
+        port (str): physical serial port, or a pyserial URL such as socket://127.0.0.1:5057 (see JDx_emulator)
+        baud (int): baud rate that sensor has
+        parity (str): parity of sensor
+        timeout (float, optional): read timeout in seconds. Defaults to 5.
+
+    Returns:
+        JDx_Transport: buffered transport over the open serial port connection.
+    """
+    return JDx_Transport(
+        serial.serial_for_url(port, baud, parity=parity, timeout=timeout)
+    )
+
+
+def query_serial_data(connection: JDx_Transport, packet: str) -> str:
+    """send a request to the device and read its answer, recording the round trip in connection.latency.
+
+    Args:
+        connection (JDx_Transport): open transport
+        packet (str): data to send over connection.
+
+    Returns:
+        str: data returned from open serial connection, empty on timeout
+    """
+    return connection.query(packet)
+
+
+def command_key(packet: str) -> tuple:
+    """the part of a command the sensor echoes back: ";000,q,gf\r\n" gives ("q", "gf").
+
+    Args:
+        packet (str): command or response.
+
+    Returns:
+        tuple: second and third comma separated fields.
+    """
+    return tuple(field.strip() for field in packet.strip().split(",")[1:3])
+
+
+def command_name(packet: str) -> str:
+    """command type a round trip is recorded under: ";000,q,gf\r\n" gives "q,gf".
+
+    Args:
+        packet (str): command.
+
+    Returns:
+        str: the echoed fields joined with a comma, or the whole command when it has none.
+    """
+    return ",".join(command_key(packet)) or packet.strip()
+
+
+def query_batch(connection: JDx_Transport, commands, window: int = None) -> dict:
+    """send several query commands back to back and collect their responses.
+
+    Repeated commands are sent once. Responses are matched to commands by their echo (";057,q,gf,..." answers
+    ";000,q,gf"); a response whose echo matches no outstanding command is given to the oldest one, as the sensor
+    answers in order. Round trips are recorded in connection.latency. With several commands in flight they include
+    the wait behind the earlier ones, and commands left unanswered count as timeouts.
+
+    Args:
+        connection (JDx_Transport): open transport to the sensor.
+        commands (iterable): commands, with or without the "\r\n" terminator.
+        window (int, optional): most commands written ahead of their responses. Defaults to all of them.
+
+    Returns:
+        dict: command (without terminator) to response frame. Commands that timed out are missing.
+    """
+    pending = list(dict.fromkeys(command.strip() for command in commands))
+    window = window or len(pending)
+    outstanding = []
+    sent = {}
+    responses = {}
+
+    while pending or outstanding:
+        while pending and len(outstanding) < window:
+            command = pending.pop(0)
+            sent[command] = time.monotonic()
+            connection.write(f"{command}\r\n")
+            outstanding.append(command)
+
+        frames = connection.read_frames()
+        if not frames:
+            break
+        received = time.monotonic()
+        for frame in frames:
+            if not outstanding:
+                break
+            key = command_key(frame)
+            command = next(
+                (command for command in outstanding if command_key(command) == key),
+                outstanding[0],
+            )
+            outstanding.remove(command)
+            responses[command] = frame
+            connection.latency.record(command_name(command), received - sent[command])
+
+    for command in outstanding + pending:
+        connection.latency.record_timeout(command_name(command))
+    return responses